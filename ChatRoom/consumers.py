@@ -1,18 +1,106 @@
 # consumers.py
 import json
-from channels.generic.websocket import AsyncWebsocketConsumer
+from urllib.parse import parse_qs
 
-class ThreadConsumer(AsyncWebsocketConsumer):
+from asgiref.sync import sync_to_async
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer, AsyncWebsocketConsumer
+
+from alerts.consumers import as_int, load_backlog
+from fields.membership import load_memberships
+from utils import replay
+from utils.chat import allowed_types
+from .events import versioned
+from .models import Thread
+
+_memberships = database_sync_to_async(load_memberships)
+
+
+@sync_to_async
+def _replayed(group, last_seq):
+    """
+    الأحداث التي فاتت العميل منذ last_seq (utils.replay)، أو حدث resync_required
+    واحد إذا تجاوزت الفجوة المخزن. قد يصل حدث حيّ مكرر بعد الانضمام للمجموعة؛
+    العميل يتجاهل أي seq <= آخر ما عالجه.
+    """
+    events = replay.missed(group, last_seq)
+    if events is None:
+        return [versioned({"type": "resync_required", "seq": replay.current_seq(group)})]
+    return events
+
+
+def _query(scope) -> dict:
+    return parse_qs(scope.get("query_string", b"").decode())
+
+
+def _last_seq(scope):
+    return as_int((_query(scope).get("last_seq") or [None])[0])
+
+
+def _event_kinds(value) -> set[str] | None:
+    """"thread_created,reply_added" أو قائمة → مجموعة؛ فارغ → كل الأنواع."""
+    if isinstance(value, str):
+        value = value.split(",")
+    elif not isinstance(value, list):
+        return None
+    kinds = {k.strip() for k in value or [] if isinstance(k, str) and k.strip()}
+    return kinds or None
+
+
+class EventFilter:
+    """
+    فلتر أحداث المجتمع على الخادم: room_type ضمن الغرف التي يفتحها مستوى
+    المستخدم، و type ضمن الأنواع التي اختارها العميل (إن اختار).
+    الأحداث بلا room_type (مثل resync_required) تمرّ دائمًا.
+    """
+    def __init__(self, room_types, kinds=None):
+        self.room_types = set(room_types)
+        self.kinds      = kinds
+
+    @classmethod
+    def for_member(cls, user, membership, kinds=None):
+        return cls(allowed_types(membership["level"], user.user_type), kinds)
+
+    def wants(self, payload: dict) -> bool:
+        room_type = payload.get("room_type")
+        if room_type is not None and room_type not in self.room_types:
+            return False
+        return self.kinds is None or payload.get("type") in self.kinds
+
+
+@database_sync_to_async
+def _thread_room_id(thread_id):
+    return (Thread.objects.filter(pk=thread_id)
+            .values_list("chat_room_id", flat=True).first())
+
+
+class ResumeMixin:
+    """?last_seq=N في رابط الاتصال → إعادة إرسال ما فات منذ N قبل الأحداث الحيّة."""
+    async def _resume(self):
+        last_seq = _last_seq(self.scope)
+        if last_seq is not None:
+            # عبر broadcast() نفسه حتى تمر الأحداث المُعادة بنفس الفلتر
+            for payload in await _replayed(self.group_name, last_seq):
+                await self.broadcast({"type": "broadcast", "payload": payload})
+
+
+class ThreadConsumer(ResumeMixin, AsyncWebsocketConsumer):
     async def connect(self):
         self.thread_id = self.scope["url_route"]["kwargs"]["thread_id"]
         self.group_name = f"thread_{self.thread_id}"
 
-        # تحقّق أن المستخدم عضو في المجتمع (اختياري)
         if not self.scope["user"].is_authenticated:
             return await self.close()
 
+        # تحقّق أن الثريد في غرفة مسموح بها للمستخدم (من خريطة العضويات المخزّنة)
+        room_id     = await _thread_room_id(self.thread_id)
+        memberships = await _memberships(self.scope["user"])
+        if not any(room_id in m["rooms"] for m in memberships.values()):
+            return await self.close()
+
         await self.channel_layer.group_add(self.group_name, self.channel_name)
         await self.accept()
+        await self._resume()
 
     async def disconnect(self, code):
         await self.channel_layer.group_discard(self.group_name, self.channel_name)
@@ -25,7 +113,7 @@ class ThreadConsumer(AsyncWebsocketConsumer):
     async def broadcast(self, event):
         await self.send(text_data=json.dumps(event["payload"]))
 
-class CommunityConsumer(AsyncWebsocketConsumer):
+class CommunityConsumer(ResumeMixin, AsyncWebsocketConsumer):
     async def connect(self):
         self.community_id = self.scope["url_route"]["kwargs"]["community_id"]
         self.group_name   = f"community_{self.community_id}"
@@ -33,12 +121,157 @@ class CommunityConsumer(AsyncWebsocketConsumer):
         if not self.scope["user"].is_authenticated:
             return await self.close()
 
+        memberships = await _memberships(self.scope["user"])
+        if self.community_id not in memberships:
+            return await self.close()
+
+        # ?events=thread_created,reply_added يضيّق الأنواع المطلوبة
+        self.filter = EventFilter.for_member(
+            self.scope["user"], memberships[self.community_id],
+            _event_kinds((_query(self.scope).get("events") or [""])[0]),
+        )
+
         await self.channel_layer.group_add(self.group_name, self.channel_name)
         await self.accept()
+        await self._resume()
 
     async def disconnect(self, code):
         await self.channel_layer.group_discard(self.group_name, self.channel_name)
 
-    # كل الرسائل من signals تُمرَّر إلى send()
+    # {"events": [...]} يغيّر الأنواع المطلوبة دون إعادة الاتصال ([] → الكل)
+    async def receive(self, text_data=None, bytes_data=None):
+        try:
+            content = json.loads(text_data or "")
+        except ValueError:
+            return
+        if isinstance(content, dict) and "events" in content:
+            self.filter.kinds = _event_kinds(content["events"])
+
+    # كل الرسائل من signals تُمرَّر إلى send() بعد الفلترة (قبل الترميز)
     async def broadcast(self, event):
-        await self.send(text_data=json.dumps(event["payload"]))
+        if self.filter.wants(event["payload"]):
+            await self.send(text_data=json.dumps(event["payload"]))
+
+
+# ─────────────────────── Multiplexed stream ───────────────────────
+class StreamConsumer(AsyncJsonWebsocketConsumer):
+    """
+    ws/stream/ — اتصال واحد بدل ws/alerts + ws/community + ws/thread لكل ثريد.
+
+    العميل يرسل:
+        {"action": "subscribe",   "channel": "community", "id": 5,
+         "events": ["thread_created"]}
+        {"action": "subscribe",   "channel": "thread",    "id": 42, "last_seq": 17}
+        {"action": "subscribe",   "channel": "alerts", "last_seen": 10}
+        {"action": "unsubscribe", "channel": "thread",    "id": 42}
+    ويستقبل كل حدث موسومًا بقناته:
+        {"channel": "thread:42", "event": {...}}
+    """
+    async def connect(self):
+        if not self.scope["user"].is_authenticated:
+            return await self.close()
+        self.subscriptions = {}          # group → channel tag
+        self.filters       = {}          # community group → EventFilter
+        await self.accept()
+
+    async def disconnect(self, code):
+        for group in getattr(self, "subscriptions", {}):
+            await self.channel_layer.group_discard(group, self.channel_name)
+
+    # ---------------------------------------------------------------- #
+    async def receive(self, text_data=None, bytes_data=None, **kwargs):
+        # إطار ليس JSON (أو ثنائي) يُرد عليه بخطأ بدل إغلاق الاتصال
+        if not text_data:
+            return await self._error("expected a JSON text frame", None)
+        try:
+            content = await self.decode_json(text_data)
+        except ValueError:
+            return await self._error("invalid JSON", text_data)
+        await self.receive_json(content, **kwargs)
+
+    async def receive_json(self, content, **kwargs):
+        if not isinstance(content, dict):
+            return await self._error("message must be a JSON object", content)
+        action  = content.get("action")
+        channel = content.get("channel")
+        if (action not in ("subscribe", "unsubscribe")
+                or not isinstance(channel, str) or channel not in self._groups):
+            return await self._error("unknown action or channel", content)
+
+        try:
+            group, tag = self._groups[channel](self, content.get("id"))
+        except (TypeError, ValueError):
+            return await self._error("invalid id", content)
+
+        if action == "unsubscribe":
+            self.filters.pop(group, None)
+            if self.subscriptions.pop(group, None) is not None:
+                await self.channel_layer.group_discard(group, self.channel_name)
+            return await self.send_json({"channel": tag, "type": "unsubscribed"})
+
+        if not await self._allowed(channel, content.get("id")):
+            return await self._error("forbidden", content)
+
+        if channel == "community":
+            memberships = await _memberships(self.scope["user"])
+            self.filters[group] = EventFilter.for_member(
+                self.scope["user"], memberships[int(content["id"])],
+                _event_kinds(content.get("events")),
+            )
+        self.subscriptions[group] = tag
+        await self.channel_layer.group_add(group, self.channel_name)
+        await self.send_json({"channel": tag, "type": "subscribed"})
+
+        last_seq = as_int(content.get("last_seq"))
+        if last_seq is not None:
+            for payload in await _replayed(group, last_seq):
+                await self._emit(group, payload)
+
+        if channel == "alerts":
+            await self._emit(group, await load_backlog(
+                self.scope["user"],
+                after_id=as_int(content.get("last_seen")),
+                after_broadcast_id=as_int(content.get("last_seen_broadcast")),
+            ))
+
+    # ---------------------------------------------------------------- #
+    def _community(self, pk):
+        pk = int(pk)
+        return f"community_{pk}", f"community:{pk}"
+
+    def _thread(self, pk):
+        pk = int(pk)
+        return f"thread_{pk}", f"thread:{pk}"
+
+    def _alerts(self, _pk):
+        return f"user_{self.scope['user'].id}", "alerts"
+
+    _groups = {"community": _community, "thread": _thread, "alerts": _alerts}
+
+    async def _allowed(self, channel, pk):
+        """نفس تحقق CommunityConsumer / ThreadConsumer (من خريطة العضويات المخزّنة)."""
+        if channel == "alerts":
+            return True
+        memberships = await _memberships(self.scope["user"])
+        if channel == "community":
+            return int(pk) in memberships
+        room_id = await _thread_room_id(int(pk))
+        return any(room_id in m["rooms"] for m in memberships.values())
+
+    async def _error(self, detail, content):
+        await self.send_json({"type": "error", "detail": detail, "request": content})
+
+    async def _emit(self, group, payload):
+        tag = self.subscriptions.get(group)
+        if tag is None:
+            return
+        event_filter = self.filters.get(group)
+        if event_filter is None or event_filter.wants(payload):
+            await self.send_json({"channel": tag, "event": payload})
+
+    # أحداث الـchannel layer (broadcast من ChatRoom، alert من alerts)
+    async def broadcast(self, event):
+        await self._emit(event.get("group"), event["payload"])
+
+    async def alert(self, event):
+        await self._emit(event.get("group"), event["payload"])
@@ -0,0 +1,58 @@
+# ChatRoom/events.py
+"""
+مخطط أحداث الـWebSocket (مُرقَّم بنسخة "v").
+
+أحداث الثريد صغيرة وثابتة الحجم: معرّفات + الحقول المتغيّرة + العدّادات،
+بدون الردود أو التفاصيل الكاملة؛ يجلب العميل الثريد كاملًا عند فتحه
+(GET /api/threads/<id>/). حجمها وزمن بنائها لا يتعلّقان بعدد الردود.
+"""
+
+EVENT_SCHEMA_VERSION = 1
+
+DETAILS_EXCERPT = 280        # حرف
+
+# الحقول القابلة للإرسال في thread_created / thread_updated
+THREAD_EVENT_FIELDS = (
+    "title", "details", "classification", "tags", "is_job_opportunity",
+    "job_type", "location", "salary", "job_link", "job_link_type", "file_attachment",
+)
+
+
+def versioned(payload: dict) -> dict:
+    """كل رسالة realtime تحمل رقم نسخة المخطط (realtime_signals._send)."""
+    return {"v": EVENT_SCHEMA_VERSION, **payload}
+
+
+def _field_value(thread, name):
+    if name == "details":
+        return ("details_excerpt", thread.details[:DETAILS_EXCERPT])
+    if name == "file_attachment":
+        return ("has_attachment", bool(thread.file_attachment))
+    return (name, getattr(thread, name))
+
+
+def thread_event(kind: str, thread, changed=None) -> dict:
+    """
+    kind: thread_created | thread_updated
+    changed: أسماء الحقول المحفوظة (update_fields)؛ None → كل THREAD_EVENT_FIELDS.
+    """
+    names  = [f for f in THREAD_EVENT_FIELDS if changed is None or f in changed]
+    fields = dict(_field_value(thread, name) for name in names)
+
+    payload = {
+        "type":         kind,
+        "id":           thread.id,
+        "chat_room":    thread.chat_room_id,
+        "community_id": thread.chat_room.community_id,
+        "room_type":    thread.chat_room.type,
+        "fields":       fields,
+        "counters":     {"likes": thread.likes_count, "replies": thread.replies_count},
+    }
+    if kind == "thread_created":
+        user = thread.created_by
+        payload.update(
+            created_at=thread.created_at.isoformat(),
+            creator_id=user.id if user else None,
+            creator_name=(user and (user.get_full_name() or user.username)) or "مستخدم غير معروف",
+        )
+    return payload
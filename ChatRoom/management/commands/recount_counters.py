@@ -0,0 +1,69 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+
+from ChatRoom.models import Thread, Reply, Like
+from ChatRoom.signals import PROMOTE_THRESHOLD
+
+
+class Command(BaseCommand):
+    help = "Recompute stored likes_count / replies_count on threads and replies and fix any drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500,
+                            help="Rows recounted per transaction (default 500).")
+        parser.add_argument("--dry-run", action="store_true",
+                            help="Report drifted rows without writing.")
+
+    def handle(self, *args, **options):
+        self.batch_size = options["batch_size"]
+        self.dry_run    = options["dry_run"]
+
+        fixed_threads = self._recount(Thread, self._thread_counts)
+        fixed_replies = self._recount(Reply, self._reply_counts)
+
+        verb = "Would fix" if self.dry_run else "Fixed"
+        self.stdout.write(self.style.SUCCESS(
+            f"✓ {verb} {fixed_threads} threads and {fixed_replies} replies"
+        ))
+
+    # ------------------------------------------------------------------ #
+    def _recount(self, model, counts_for):
+        ids   = list(model.objects.order_by("pk").values_list("pk", flat=True))
+        fixed = 0
+        for start in range(0, len(ids), self.batch_size):
+            chunk = ids[start:start + self.batch_size]
+            with transaction.atomic():
+                likes, replies = counts_for(chunk)
+                stale = []
+                for obj in (model.objects.select_for_update()
+                                 .filter(pk__in=chunk)
+                                 .only("pk", "likes_count", "replies_count")):
+                    good = (likes.get(obj.pk, 0), replies.get(obj.pk, 0))
+                    if (obj.likes_count, obj.replies_count) != good:
+                        obj.likes_count, obj.replies_count = good
+                        stale.append(obj)
+                if stale and not self.dry_run:
+                    model.objects.bulk_update(stale, ["likes_count", "replies_count"])
+                fixed += len(stale)
+
+        if model is Reply and not self.dry_run:
+            Reply.objects.filter(likes_count__gte=PROMOTE_THRESHOLD, is_promoted=False).update(is_promoted=True)
+            Reply.objects.filter(likes_count__lt=PROMOTE_THRESHOLD, is_promoted=True).update(is_promoted=False)
+        return fixed
+
+    @staticmethod
+    def _thread_counts(chunk):
+        likes = dict(Like.objects.filter(thread_id__in=chunk, reply__isnull=True)
+                     .values_list("thread_id").annotate(n=Count("id")))
+        replies = dict(Reply.objects.filter(thread_id__in=chunk)
+                       .values_list("thread_id").annotate(n=Count("id")))
+        return likes, replies
+
+    @staticmethod
+    def _reply_counts(chunk):
+        likes = dict(Like.objects.filter(reply_id__in=chunk)
+                     .values_list("reply_id").annotate(n=Count("id")))
+        children = dict(Reply.objects.filter(parent_reply_id__in=chunk)
+                        .values_list("parent_reply_id").annotate(n=Count("id")))
+        return likes, children
@@ -0,0 +1,60 @@
+# Generated by Django 5.1.7 on 2026-10-18 18:47
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_counters(apps, schema_editor):
+    Thread = apps.get_model("ChatRoom", "Thread")
+    Reply  = apps.get_model("ChatRoom", "Reply")
+    Like   = apps.get_model("ChatRoom", "Like")
+
+    thread_likes = dict(Like.objects.filter(thread__isnull=False, reply__isnull=True)
+                        .values_list("thread_id").annotate(n=Count("id")))
+    thread_replies = dict(Reply.objects.values_list("thread_id").annotate(n=Count("id")))
+    threads = [
+        Thread(pk=pk, likes_count=thread_likes.get(pk, 0), replies_count=thread_replies.get(pk, 0))
+        for pk in Thread.objects.values_list("pk", flat=True)
+    ]
+    Thread.objects.bulk_update(threads, ["likes_count", "replies_count"], batch_size=500)
+
+    reply_likes = dict(Like.objects.filter(reply__isnull=False)
+                       .values_list("reply_id").annotate(n=Count("id")))
+    reply_children = dict(Reply.objects.filter(parent_reply__isnull=False)
+                          .values_list("parent_reply_id").annotate(n=Count("id")))
+    replies = [
+        Reply(pk=pk, likes_count=reply_likes.get(pk, 0), replies_count=reply_children.get(pk, 0))
+        for pk in Reply.objects.values_list("pk", flat=True)
+    ]
+    Reply.objects.bulk_update(replies, ["likes_count", "replies_count"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ChatRoom', '0004_remove_like_like_target_xor'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reply',
+            name='likes_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='reply',
+            name='replies_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='thread',
+            name='likes_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='thread',
+            name='replies_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 5.1.7 on 2026-10-18 18:48
+
+from django.conf import settings
+from django.db import migrations, models
+
+PATH_STEP = 8
+BASE36 = "0123456789abcdefghijklmnopqrstuvwxyz"
+
+
+def segment(pk):
+    digits = ""
+    while pk:
+        pk, rem = divmod(pk, 36)
+        digits = BASE36[rem] + digits
+    return digits.rjust(PATH_STEP, "0")
+
+
+def backfill_paths(apps, schema_editor):
+    Reply = apps.get_model("ChatRoom", "Reply")
+    parents = dict(Reply.objects.values_list("pk", "parent_reply_id"))
+    paths = {}
+
+    def path_of(pk):
+        # تسلق الأسلاف حتى أول مسار معروف ثم النزول مرة أخرى
+        chain = []
+        while pk is not None and pk not in paths:
+            chain.append(pk)
+            pk = parents.get(pk)
+        prefix = paths.get(pk, "")
+        for node in reversed(chain):
+            prefix += segment(node)
+            paths[node] = prefix
+        return paths[chain[0]] if chain else prefix
+
+    batch = []
+    for pk in parents:
+        path = path_of(pk)
+        batch.append(Reply(pk=pk, path=path, depth=len(path) // PATH_STEP - 1))
+        if len(batch) >= 500:
+            Reply.objects.bulk_update(batch, ["path", "depth"])
+            batch = []
+    if batch:
+        Reply.objects.bulk_update(batch, ["path", "depth"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ChatRoom', '0005_stored_counters'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reply',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='reply',
+            name='path',
+            field=models.CharField(blank=True, default='', editable=False, max_length=255),
+        ),
+        migrations.AddIndex(
+            model_name='reply',
+            index=models.Index(fields=['thread', 'path'], name='ChatRoom_re_thread__341c70_idx'),
+        ),
+        migrations.RunPython(backfill_paths, migrations.RunPython.noop),
+    ]
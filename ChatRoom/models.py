@@ -24,6 +24,21 @@ def reply_upload_path(instance: "Reply", filename: str) -> str:
     return f"reply_files/thread_{tid}/{filename}"
 
 
+# المسار المُجسَّد للردود: مقطع base36 بطول ثابت لكل مستوى (id الرد)
+REPLY_PATH_STEP = 8
+REPLY_MAX_DEPTH = 255 // REPLY_PATH_STEP - 1
+_BASE36 = "0123456789abcdefghijklmnopqrstuvwxyz"
+
+
+def reply_path_segment(pk: int) -> str:
+    """id → مقطع base36 مُبطَّن بالأصفار، فيتطابق الترتيب النصّي مع ترتيب الإنشاء."""
+    digits = ""
+    while pk:
+        pk, rem = divmod(pk, 36)
+        digits = _BASE36[rem] + digits
+    return digits.rjust(REPLY_PATH_STEP, "0")
+
+
 # ───────────────────────────── models ─────────────────────────────
 class ChatRoom(models.Model):
     ROOM_TYPE_CHOICES = [
@@ -83,6 +98,10 @@ class Thread(models.Model):
     classification = models.CharField(max_length=100, default="General")
     tags           = models.JSONField(default=list, blank=True)
 
+    # عدّادات مُخزّنة (تُحدَّث بالسيجنال عبر F()، وتُصلَح بـ recount_counters)
+    likes_count    = models.PositiveIntegerField(default=0)
+    replies_count  = models.PositiveIntegerField(default=0)
+
     class Meta:
         ordering = ["-created_at"]
         indexes  = [
@@ -113,17 +132,55 @@ class Reply(models.Model):
 
     is_promoted  = models.BooleanField(default=False)   # ← يُحدَّث بالسيجنال
 
+    likes_count   = models.PositiveIntegerField(default=0)
+    replies_count = models.PositiveIntegerField(default=0)   # الردود المباشرة فقط
+
+    # مسار الأسلاف + الرد نفسه (مقاطع reply_path_segment) وعمقه في الشجرة
+    path  = models.CharField(max_length=255, blank=True, default="", editable=False)
+    depth = models.PositiveSmallIntegerField(default=0, editable=False)
+
     class Meta:
         verbose_name        = "Reply"
         verbose_name_plural = "Replies"
         ordering            = ["created_at"]
         indexes             = [
             models.Index(fields=["thread", "created_at"]),
+            models.Index(fields=["thread", "path"]),      # شجرة/فرع كامل بمسح نطاق واحد
         ]
 
     def __str__(self) -> str:        # pragma: no cover
         return f"Reply to {self.thread.title} by {self.created_by}"
 
+    def save(self, *args, **kwargs):
+        creating = self._state.adding
+        super().save(*args, **kwargs)
+        if creating and not self.path:
+            self._assign_path()
+
+    def _assign_path(self):
+        """المسار يحتاج id الرد، لذا يُكتب بعد الإدخال مباشرةً."""
+        parent_path, parent_depth = "", -1
+        if self.parent_reply_id is not None:
+            parent_path, parent_depth = (Reply.objects
+                                         .filter(pk=self.parent_reply_id)
+                                         .values_list("path", "depth")
+                                         .get())
+        self.path  = parent_path + reply_path_segment(self.pk)
+        self.depth = parent_depth + 1
+        Reply.objects.filter(pk=self.pk).update(path=self.path, depth=self.depth)
+
+    # ----- tree helpers
+    def subtree(self, include_self=True):
+        """الرد وكل ما تحته، بترتيب العرض (مسح نطاق على فهرس thread, path)."""
+        if not self.path:
+            # صف أُدخل دون save() (bulk_create / raw): "" يطابق الثريد كله
+            qs = Reply.objects.filter(pk=self.pk)
+        else:
+            qs = Reply.objects.filter(thread_id=self.thread_id, path__startswith=self.path)
+        if not include_self:
+            qs = qs.exclude(pk=self.pk)
+        return qs.order_by("path")
+
 
 class Like(models.Model):
     """
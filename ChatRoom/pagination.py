@@ -0,0 +1,21 @@
+# ChatRoom/pagination.py
+from rest_framework.pagination import CursorPagination
+
+
+class ThreadCursorPagination(CursorPagination):
+    """
+    ترقيم بالمؤشّر (keyset) لقوائم الثريدات:
+    • لا COUNT(*) ولا OFFSET، فعمق التمرير لا يبطئ الاستعلام.
+    • الترتيب (created_at, id) يركب على Index(chat_room, -created_at)،
+      و id يكسر التعادل فتبقى الصفحات ثابتة مع وصول ثريدات جديدة.
+    حجم الصفحة = PAGE_SIZE من إعدادات REST_FRAMEWORK.
+    """
+    ordering = ("-created_at", "-id")
+
+
+class ReplyCursorPagination(CursorPagination):
+    """
+    صفحات الردود داخل ثريد (العليا أو أبناء رد معيّن) بترتيب الإنشاء؛
+    العميل يجلب ما يظهر على الشاشة فقط ثم يتابع عبر next.
+    """
+    ordering = ("created_at", "id")
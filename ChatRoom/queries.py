@@ -0,0 +1,100 @@
+# ChatRoom/queries.py
+"""
+أدوات استعلام مشتركة بين الـViews والـSerializers.
+"""
+
+from django.db.models import Exists, OuterRef
+
+from .models import Reply, Like
+
+
+# ─────────────────────────── Like meta ───────────────────────────
+def _viewer(user):
+    return user if user is not None and user.is_authenticated else None
+
+
+def with_thread_like_meta(qs, user=None):
+    """
+    يضيف liked_by_me لكل ثريد داخل نفس استعلام الصفحة (Exists)،
+    بدل EXISTS لكل كائن في الـSerializer. likes_count عمود مُخزّن.
+    """
+    viewer = _viewer(user)
+    if viewer is not None:
+        qs = qs.annotate(liked_by_me=Exists(
+            Like.objects.filter(thread=OuterRef("pk"), user=viewer, reply__isnull=True)
+        ))
+    return qs
+
+
+def with_reply_like_meta(qs, user=None):
+    """نفس with_thread_like_meta لكن لمجموعة ردود."""
+    viewer = _viewer(user)
+    if viewer is not None:
+        qs = qs.annotate(liked_by_me=Exists(
+            Like.objects.filter(reply=OuterRef("pk"), user=viewer)
+        ))
+    return qs
+
+
+# ─────────────────────────── Reply tree ──────────────────────────
+def _tree_order(reply):
+    return (-reply.likes_count, reply.created_at)
+
+
+def load_reply_tree(thread, user=None):
+    """
+    يحمّل كل ردود الثريد (مع حالة اللايك والكاتب) باستعلام واحد
+    (مسح نطاق على فهرس thread, path) ثم يبني علاقات الأب/الابن في الذاكرة،
+    مهما كان عمق التداخل.
+
+    يرجع (replies, roots):
+      • replies → كل الردود بترتيب الإنشاء (القائمة المسطّحة)
+      • roots   → الردود العليا مرتّبة حسب (-likes_count, created_at)
+    كل ردّ يحمل tree_children بنفس الترتيب، فلا يحتاج الـSerializer أي استعلام إضافي.
+    """
+    qs = with_reply_like_meta(
+        Reply.objects.filter(thread=thread).select_related("created_by"),
+        user,
+    ).order_by("path")
+    return _link_tree(list(qs))
+
+
+def load_reply_subtree(reply, user=None):
+    """نفس load_reply_tree لكن لفرع واحد يبدأ من reply (بدون الرد نفسه)."""
+    qs = with_reply_like_meta(
+        reply.subtree(include_self=False).select_related("created_by"),
+        user,
+    )
+    return _link_tree(list(qs), root=reply)
+
+
+def _link_tree(replies, root=None):
+    """
+    replies مرتّبة حسب path، لذا يظهر كل أب قبل أبنائه.
+    root: أب الفرع عند تحميل فرع جزئي (أبناؤه المباشرون هم الجذور).
+    """
+    root_id = root.id if root is not None else None
+    by_id   = {r.id: r for r in replies}
+    roots   = []
+
+    for r in replies:
+        r.tree_children = []
+
+    for r in replies:
+        if r.parent_reply_id == root_id:
+            if root is not None:
+                r.parent_reply = root
+            roots.append(r)
+            continue
+        parent = by_id.get(r.parent_reply_id)
+        if parent is None:           # أب خارج الثريد → لا يظهر في الشجرة
+            continue
+        r.parent_reply = parent      # يُغني parent_snippet عن استعلام الأب
+        parent.tree_children.append(r)
+
+    roots.sort(key=_tree_order)
+    for r in replies:
+        r.tree_children.sort(key=_tree_order)
+
+    replies.sort(key=lambda r: (r.created_at, r.id))
+    return replies, roots
@@ -1,38 +1,50 @@
 import json
-from asgiref.sync import async_to_sync
-from channels.layers import get_channel_layer
-from django.db import transaction
+from django.conf import settings
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from django.contrib.auth import get_user_model
 
 from .models import Thread, Reply, Like
-from .serializers import ThreadSerializer, ReplySerializer
+from .events import thread_event, versioned
+from .serializers import ReplyListSerializer
+from alerts import outbox
 
 User = get_user_model()
-layer = get_channel_layer()
 
 # ─────────────────── Helper ───────────────────
-def _send(group: str, payload: dict):
-    transaction.on_commit(
-        lambda: async_to_sync(layer.group_send)(
-            group,
-            {"type": "broadcast", "payload": payload},
-        )
-    )
+def _stored(model, pk, field):
+    """قراءة عدّاد مُخزّن بعد تحديثه بـ F() في ChatRoom.signals."""
+    return model.objects.filter(pk=pk).values_list(field, flat=True).first() or 0
+
+
+def _send(*groups: str, payload: dict):
+    """يُكتب في الـOutbox ضمن نفس المعاملة، ويرسله run_outbox بعد الـcommit."""
+    payload = versioned(payload)
+    outbox.send_many([(g, {"type": "broadcast", "payload": payload}) for g in groups])
 
 # ─────────────────── Threads ───────────────────
 @receiver(post_save, sender=Thread, dispatch_uid="thread_save_broadcast")
-def thread_saved(sender, instance, created, **kwargs):
+def thread_saved(sender, instance, created, update_fields=None, **kwargs):
+    # التسلسل يتم في العامل لا في الطلب؛ update_fields تحدد الحقول المتغيّرة
+    changed = sorted(update_fields) if update_fields else None
+    outbox.enqueue("realtime.thread_saved", thread_id=instance.id, created=created, changed=changed)
+
+
+@outbox.handler("realtime.thread_saved")
+def broadcast_thread(thread_id: int, created: bool, changed=None):
+    instance = (Thread.objects.select_related("chat_room", "created_by")
+                .filter(pk=thread_id).first())
+    if instance is None:
+        return
     group = f"community_{instance.chat_room.community_id}"
     event = "thread_created" if created else "thread_updated"
-    data = ThreadSerializer(instance, context={"request": None}).data
-    _send(group, {"type": event, "thread": data, "room_type": instance.chat_room.type})  # ★ إضافة room_type
+    # حدث مُدمج (events.thread_event) بدل ThreadSerializer الكامل مع شجرة الردود
+    _send(group, payload=thread_event(event, instance, changed))
 
 @receiver(post_delete, sender=Thread, dispatch_uid="thread_delete_broadcast")
 def thread_deleted(sender, instance, **kwargs):
     group = f"community_{instance.chat_room.community_id}"
-    _send(group, {
+    _send(group, payload={
         "type": "thread_deleted",
         "id": instance.id,
         "room_type": instance.chat_room.type  # ★ إضافة room_type
@@ -41,25 +53,32 @@ def thread_deleted(sender, instance, **kwargs):
 # ─────────────────── Replies ───────────────────
 @receiver(post_save, sender=Reply, dispatch_uid="reply_save_broadcast")
 def reply_saved(sender, instance, created, **kwargs):
-    if not created:
-        return 
-    print("### SIGNAL: reply_saved fired ###")
-    replies = instance.thread.replies.count()
+    if created:
+        outbox.enqueue("realtime.reply_added", reply_id=instance.id)
+
+
+@outbox.handler("realtime.reply_added")
+def broadcast_reply(reply_id: int):
+    instance = (Reply.objects.select_related("thread__chat_room", "created_by")
+                .filter(pk=reply_id).first())
+    if instance is None:
+        return
+    replies = _stored(Thread, instance.thread_id, "replies_count")
     payload = {
         "type": "reply_added",
         "thread_id": instance.thread_id,
         "replies": replies,
-        "reply": ReplySerializer(instance, context={"request": None}).data,
+        "reply": ReplyListSerializer(instance, context={"request": None}).data,
         "room_type": instance.thread.chat_room.type  # ★ إضافة room_type
     }
-    _send(f"thread_{instance.thread_id}", payload)
-    _send(f"community_{instance.thread.chat_room.community_id}", payload)
+    _send(f"thread_{instance.thread_id}",
+          f"community_{instance.thread.chat_room.community_id}", payload=payload)
 
 @receiver(post_delete, sender=Reply, dispatch_uid="reply_delete_broadcast")
 def reply_deleted(sender, instance, **kwargs):
     thread_group = f"thread_{instance.thread_id}"
     community_group = f"community_{instance.thread.chat_room.community_id}"
-    replies = instance.thread.replies.count()
+    replies = _stored(Thread, instance.thread_id, "replies_count")
     payload = {
         "type": "reply_deleted",
         "thread_id": instance.thread_id,
@@ -67,56 +86,60 @@ def reply_deleted(sender, instance, **kwargs):
         "replies": replies,
         "room_type": instance.thread.chat_room.type  # ★ إضافة room_type
     }
-    _send(thread_group, payload)
-    _send(community_group, payload)
+    _send(thread_group, community_group, payload=payload)
 
 # ─────────────────── Likes ───────────────────
+# عدّاد اللايكات يُبث مرة واحدة لكل نافذة LIKE_BROADCAST_WINDOW لكل ثريد/رد
+# (آخر قيمة مُخزّنة عند الإرسال)، بينما يصل صاحب الضغطة تأكيد liked_by_me فورًا
+# عبر مجموعته الشخصية user_<id>.
+LIKE_BROADCAST_WINDOW = getattr(settings, "REALTIME_LIKE_WINDOW_MS", 250) / 1000
+
+
 @receiver([post_save, post_delete], sender=Like, dispatch_uid="like_toggle_broadcast")
-def like_toggled(sender, instance, **kwargs):
+def like_toggled(sender, instance, signal, **kwargs):
     # تجاهل الإشارة إذا لم يعد هناك هدف
-    if instance.thread_id is None and instance.reply_id is None:
+    if instance.thread_id is not None:
+        kind, target_id = "thread", instance.thread_id
+    elif instance.reply_id is not None:
+        kind, target_id = "reply", instance.reply_id
+    else:
         return
 
-    user = instance.user
+    # post_save = أُضيف اللايك، post_delete = أُزيل → لا حاجة لاستعلام EXISTS
+    _send(f"user_{instance.user_id}", payload={
+        "type":        f"{kind}_like_toggled",
+        "id":          target_id,
+        "liked_by_me": signal is post_save,
+    })
 
-    # فرع الـ Thread
-    if instance.thread_id is not None:
-        try:
-            t = instance.thread
-            room_type    = t.chat_room.type
-            community_id = t.chat_room.community_id
-            likes        = t.stars.filter(reply__isnull=True).count()
-            liked_by_me  = t.stars.filter(user=user, reply__isnull=True).exists()
-        except Thread.DoesNotExist:
-            return
+    if not outbox.is_pending("realtime.like_count", kind=kind, id=target_id):
+        outbox.enqueue("realtime.like_count", delay=LIKE_BROADCAST_WINDOW,
+                       kind=kind, id=target_id)
 
-        payload = {
-            "type":         "thread_like_toggled",
-            "id":           t.id,
-            "likes":        likes,
-            "liked_by_me":  liked_by_me,
-            "room_type":    room_type,
-        }
-        _send(f"thread_{t.id}",        payload)
-        _send(f"community_{community_id}", payload)
-        return
 
-    # فرع الـ Reply
-    if instance.reply_id is not None:
-        try:
-            r = instance.reply
-            t = r.thread
-            room_type   = t.chat_room.type
-            likes       = r.stars.count()
-            liked_by_me = r.stars.filter(user=user).exists()
-        except (Reply.DoesNotExist, Thread.DoesNotExist):
+@outbox.handler("realtime.like_count")
+def broadcast_like_count(kind: str, id: int):
+    # قراءة مع قفل: إن كان لايك لم يُـcommit بعد قد حدّث العدّاد ننتظره بدل إرسال قيمة قديمة
+    if kind == "thread":
+        t = (Thread.objects.select_related("chat_room").select_for_update(of=("self",))
+             .filter(pk=id).first())
+        if t is None:
             return
+        _send(f"thread_{t.id}", f"community_{t.chat_room.community_id}", payload={
+            "type":      "thread_like_toggled",
+            "id":        t.id,
+            "likes":     t.likes_count,
+            "room_type": t.chat_room.type,
+        })
+        return
 
-        payload = {
-            "type":        "reply_like_toggled",
-            "id":          r.id,
-            "likes":       likes,
-            "liked_by_me": liked_by_me,
-            "room_type":   room_type,
-        }
-        _send(f"thread_{r.thread_id}", payload)
+    r = (Reply.objects.select_related("thread__chat_room").select_for_update(of=("self",))
+         .filter(pk=id).first())
+    if r is None:
+        return
+    _send(f"thread_{r.thread_id}", payload={
+        "type":      "reply_like_toggled",
+        "id":        r.id,
+        "likes":     r.likes_count,
+        "room_type": r.thread.chat_room.type,
+    })
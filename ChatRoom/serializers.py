@@ -1,13 +1,13 @@
 """
 Serializers with minor fixes:
 • إزالة تمرير context فارغ يمنع liked_by_me من العمل.
-• تحسين الأداء عبر select/prefetch داخل get_replies_tree.
+• شجرة الردود تُبنى في الذاكرة من استعلام واحد (queries.load_reply_tree).
 """
 
 from rest_framework import serializers
-from django.db.models import Prefetch, Count
 
-from .models import ChatRoom, Thread, Reply, Like
+from .models import ChatRoom, Thread, Reply, Like, REPLY_MAX_DEPTH
+from .queries import load_reply_tree, with_reply_like_meta
 
 
 # ─────────────────────────── ChatRoom ───────────────────────────
@@ -21,7 +21,8 @@ class ChatRoomSerializer(serializers.ModelSerializer):
 
 # ─────────────────────────── Reply ──────────────────────────────
 class ReplySerializer(serializers.ModelSerializer):
-    likes_count  = serializers.SerializerMethodField()
+    likes_count  = serializers.IntegerField(read_only=True)
+    replies_count = serializers.IntegerField(read_only=True)
     liked_by_me  = serializers.SerializerMethodField()
     creator_name = serializers.SerializerMethodField()
     children     = serializers.SerializerMethodField()
@@ -35,16 +36,34 @@ class ReplySerializer(serializers.ModelSerializer):
             "id", "thread", "reply_text", "created_by", "creator_name",
             "created_at", "parent_reply", "likes_count", "liked_by_me",
             "file", "children", "is_promoted","parent_snippet",
+            "replies_count",
         ]
 
     # ----- helpers
     def _user(self):
         return self.context.get("request").user if self.context.get("request") else None
 
-    def get_likes_count(self, obj):
-        return obj.stars.count()
+    # ----- validation (المسار المُجسَّد يفترض شجرة ثابتة داخل ثريد واحد)
+    def validate(self, data):
+        parent = data.get("parent_reply")
+        if self.instance is not None:
+            # path الرد وأبنائه وعدّادات replies_count مبنية على مكانه الأصلي
+            if "parent_reply" in data and parent != self.instance.parent_reply:
+                raise serializers.ValidationError("لا يمكنك نقل الرد إلى مكان آخر.")
+            if "thread" in data and data["thread"].pk != self.instance.thread_id:
+                raise serializers.ValidationError("لا يمكنك نقل الرد إلى ثريد آخر.")
+            return data
+        if parent is not None:
+            if parent.thread_id != data["thread"].id:
+                raise serializers.ValidationError("الرد الأب يتبع ثريدًا آخر.")
+            if parent.depth >= REPLY_MAX_DEPTH:
+                raise serializers.ValidationError("تم بلوغ الحد الأقصى لعمق الردود.")
+        return data
 
     def get_liked_by_me(self, obj):
+        annotated = getattr(obj, "liked_by_me", None)
+        if annotated is not None:
+            return annotated
         user = self._user()
         return bool(user and not user.is_anonymous and obj.stars.filter(user=user).exists())
 
@@ -55,11 +74,13 @@ class ReplySerializer(serializers.ModelSerializer):
         return user.get_full_name() or user.username or "مستخدم غير معروف"
 
     def get_children(self, obj):
+        # الشجرة المبنية مسبقًا عبر load_reply_tree لا تحتاج أي استعلام
+        children = getattr(obj, "tree_children", None)
+        if children is not None:
+            return ReplySerializer(children, many=True, context=self.context).data
         qs = (
-            obj.nested_replies
-              .annotate(likes_count=Count("stars"))
+            with_reply_like_meta(obj.nested_replies.select_related("created_by"), self._user())
               .order_by("-likes_count", "created_at")
-              .select_related("created_by")
         )
         return ReplySerializer(qs, many=True, context=self.context).data
     
@@ -77,12 +98,22 @@ class ReplySerializer(serializers.ModelSerializer):
         }
 
 
+class ReplyListSerializer(ReplySerializer):
+    """
+    رد واحد في صفحة (by-thread / children): بدون children،
+    والعميل يوسّع الفرع عند الطلب اعتمادًا على replies_count.
+    """
+
+    class Meta(ReplySerializer.Meta):
+        fields = [f for f in ReplySerializer.Meta.fields if f != "children"]
+
+
 # ─────────────────────────── Thread ─────────────────────────────
 class ThreadSerializer(serializers.ModelSerializer):
-    replies        = ReplySerializer(many=True, read_only=True)   # ← لم نعد نمرّر context فارغ
+    replies        = serializers.SerializerMethodField()
     replies_tree   = serializers.SerializerMethodField()
-    replies_count  = serializers.SerializerMethodField()
-    likes_count    = serializers.SerializerMethodField()
+    replies_count  = serializers.IntegerField(read_only=True)
+    likes_count    = serializers.IntegerField(read_only=True)
     liked_by_me    = serializers.SerializerMethodField()
     creator_name   = serializers.SerializerMethodField()
     creator_id     = serializers.IntegerField(source="created_by.id", read_only=True)
@@ -105,40 +136,29 @@ class ThreadSerializer(serializers.ModelSerializer):
         ]
 
     # ----- tree helper
-    def get_replies_tree(self, obj):
-        replies_qs = (
-            Reply.objects.filter(thread=obj, parent_reply__isnull=True)
-            .annotate(likes_count=Count("stars"))
-            .select_related("created_by")
-            .prefetch_related(
-                Prefetch(
-                    "nested_replies",
-                    queryset=Reply.objects.annotate(likes_count=Count("stars"))
-                                            .select_related("created_by")
-                                            .order_by("-likes_count", "created_at"),
-                )
-            )
-            .order_by("-likes_count", "created_at")
-        )
+    def _reply_tree(self, obj):
+        """استعلام واحد يخدم replies و replies_tree معًا."""
+        if getattr(obj, "_reply_tree", None) is None:
+            obj._reply_tree = load_reply_tree(obj, self._user())
+        return obj._reply_tree
 
-        def build_node(reply):
-            data = ReplySerializer(reply, context=self.context).data
-            data["children"] = [build_node(child) for child in reply.nested_replies.all()]
-            return data
+    def get_replies(self, obj):
+        replies, _ = self._reply_tree(obj)
+        return ReplySerializer(replies, many=True, context=self.context).data
 
-        return [build_node(r) for r in replies_qs]
+    def get_replies_tree(self, obj):
+        _, roots = self._reply_tree(obj)
+        return ReplySerializer(roots, many=True, context=self.context).data
 
     # ----- meta info
     def _user(self):
         return self.context.get("request").user if self.context.get("request") else None
 
-    def get_replies_count(self, obj):
-        return obj.replies.count()
-
-    def get_likes_count(self, obj):
-        return obj.stars.filter(reply__isnull=True).count()
-
+    # liked_by_me المُحسوب مسبقًا عبر annotate له الأولوية على الاستعلام لكل صف
     def get_liked_by_me(self, obj):
+        annotated = getattr(obj, "liked_by_me", None)
+        if annotated is not None:
+            return annotated
         user = self._user()
         return bool(user and not user.is_anonymous and obj.stars.filter(user=user, reply__isnull=True).exists())
 
@@ -149,6 +169,19 @@ class ThreadSerializer(serializers.ModelSerializer):
         return user.get_full_name() or user.username or "مستخدم غير معروف"
 
 
+class ThreadListSerializer(ThreadSerializer):
+    """
+    بطاقة الثريد في القوائم: بدون replies / replies_tree.
+    العدّادات أعمدة مُخزّنة، و liked_by_me يأتي من annotate في ThreadViewSet.get_queryset.
+    """
+
+    class Meta(ThreadSerializer.Meta):
+        fields = [
+            f for f in ThreadSerializer.Meta.fields
+            if f not in ("replies", "replies_tree")
+        ]
+
+
 # ─────────────────────────── Like ───────────────────────────────
 class LikeSerializer(serializers.ModelSerializer):
     thread = serializers.PrimaryKeyRelatedField(queryset=Thread.objects.all(), required=False, allow_null=True)
@@ -1,25 +1,108 @@
 # ChatRoom/signals.py
 
+from django.db.models import BooleanField, ExpressionWrapper, F, Q
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from .models import Like, Reply
+from .models import ChatRoom, Like, Reply, Thread
+from utils.versions import bump
 
 # الحد الأدنى من اللايكات لترقية الرد
 PROMOTE_THRESHOLD = 10
 
-@receiver([post_save, post_delete], sender=Like)
-def update_promotion(sender, instance, **kwargs):
+
+# ──────────────────────────── helpers ────────────────────────────
+def _shift(model, pk, field, delta):
+    """
+    زيادة/إنقاص عدّاد مُخزّن ذرّيًا داخل قاعدة البيانات (بدون قراءة).
+    الإنقاص يتخطّى الصف الذي عدّاده 0: في MySQL العمود UNSIGNED و0-1 يرفع
+    الخطأ 1690 قبل أي Greatest().
+    """
+    if pk is None:
+        return
+    rows = model.objects.filter(pk=pk)
+    if delta < 0:
+        rows = rows.filter(**{f"{field}__gte": -delta})
+    rows.update(**{field: F(field) + delta})
+
+
+def _apply_like(like, delta):
+    if like.reply_id is not None:
+        _shift(Reply, like.reply_id, "likes_count", delta)
+        update_promotion(like.reply_id)
+    elif like.thread_id is not None:
+        _shift(Thread, like.thread_id, "likes_count", delta)
+
+
+def update_promotion(reply_id):
     """
-    عند إضافة أو حذف لايك، نتحقق من عدد اللايكات على الرد
-    فإذا وصل أو تجاوز الـ PROMOTE_THRESHOLD نجعله مروجًا، وإلا نرفعه.
+    نجعل الرد مروجًا إذا وصل عدد لايكاته PROMOTE_THRESHOLD أو تجاوزه، وإلا نرفعه.
+    يُقرأ العدّاد المُخزّن داخل نفس الـUPDATE.
     """
-    if instance.reply_id is None:
+    promoted = ExpressionWrapper(Q(likes_count__gte=PROMOTE_THRESHOLD),
+                                 output_field=BooleanField())
+    Reply.objects.filter(pk=reply_id).update(is_promoted=promoted)
+
+
+# ──────────────────────────── Likes ──────────────────────────────
+@receiver(post_save, sender=Like)
+def like_created(sender, instance, created, **kwargs):
+    if created:
+        _apply_like(instance, +1)
+
+
+@receiver(post_delete, sender=Like)
+def like_deleted(sender, instance, **kwargs):
+    _apply_like(instance, -1)
+
+
+# ──────────────────────────── Replies ────────────────────────────
+@receiver(post_save, sender=Reply)
+def reply_created(sender, instance, created, **kwargs):
+    if not created:
         return
-    
-    reply = instance.reply
-    if reply:
-        count = reply.stars.count()
-        promoted = count >= PROMOTE_THRESHOLD
-        if reply.is_promoted != promoted:
-            reply.is_promoted = promoted
-            reply.save(update_fields=['is_promoted'])
+    _shift(Thread, instance.thread_id, "replies_count", +1)
+    _shift(Reply, instance.parent_reply_id, "replies_count", +1)
+
+
+@receiver(post_delete, sender=Reply)
+def reply_deleted(sender, instance, **kwargs):
+    _shift(Thread, instance.thread_id, "replies_count", -1)
+    _shift(Reply, instance.parent_reply_id, "replies_count", -1)
+
+
+# ──────────────────────── version stamps ─────────────────────────
+# تُبطل ETag الخاص بـ ThreadViewSet / ChatRoomViewSet (utils.conditional)
+def _bump_thread(thread_id):
+    community_id = (Thread.objects.filter(pk=thread_id)
+                    .values_list("chat_room__community_id", flat=True).first())
+    scopes = [f"thread_{thread_id}"]
+    if community_id is not None:
+        scopes.append(f"threads:community_{community_id}")
+    bump(*scopes)
+
+
+@receiver([post_save, post_delete], sender=Thread)
+def thread_changed(sender, instance, **kwargs):
+    bump(f"thread_{instance.pk}",
+         f"threads:community_{instance.chat_room.community_id}")
+
+
+@receiver([post_save, post_delete], sender=Reply)
+def reply_changed(sender, instance, **kwargs):
+    _bump_thread(instance.thread_id)
+
+
+@receiver([post_save, post_delete], sender=Like)
+def like_changed(sender, instance, **kwargs):
+    thread_id = instance.thread_id
+    if thread_id is None and instance.reply_id is not None:
+        thread_id = (Reply.objects.filter(pk=instance.reply_id)
+                     .values_list("thread_id", flat=True).first())
+    if thread_id is not None:
+        _bump_thread(thread_id)
+
+
+@receiver([post_save, post_delete], sender=ChatRoom)
+def chat_room_changed(sender, instance, **kwargs):
+    # chat_rooms يُقادم خرائط الغرف المسموح بها في fields.membership
+    bump(f"rooms:community_{instance.community_id}", "chat_rooms")
@@ -1,21 +1,27 @@
 # ChatRoom/views.py
 from django.shortcuts import get_object_or_404
 from rest_framework import viewsets, permissions, status
+from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from django.db import transaction
 from .models import ChatRoom, Thread, Reply, Like
-from ChatRoom.serializers import (ChatRoomSerializer, ThreadSerializer,ReplySerializer, LikeSerializer)
-from fields.models import Community, UserCommunity
+from .queries import with_thread_like_meta, with_reply_like_meta, load_reply_subtree
+from .pagination import ThreadCursorPagination, ReplyCursorPagination
+from ChatRoom.serializers import (ChatRoomSerializer, ThreadSerializer, ThreadListSerializer,
+                                  ReplySerializer, ReplyListSerializer, LikeSerializer)
+from fields.models import Community
+from fields.membership import community_level, allowed_room_ids_or_404
 from rest_framework.permissions import BasePermission
-from utils.chat import allowed_types
 from rest_framework.exceptions import PermissionDenied
 from accounts.permissions import IsCommunityMember      # جديد
 from accounts.permissions import IsCommunityMember, IsOwnerOrReadOnly
+from utils.conditional import ConditionalGetMixin
 
 
 # ─────────────────────────── ChatRoom ───────────────────────────
-class ChatRoomViewSet(viewsets.ReadOnlyModelViewSet,     # لا نحتاج update/delete
+class ChatRoomViewSet(ConditionalGetMixin,
+                      viewsets.ReadOnlyModelViewSet,     # لا نحتاج update/delete
                       viewsets.GenericViewSet):
     """
     - list: يعرض الغرف المسموح بها للمستخدم داخل مجتمع محدّد.
@@ -29,21 +35,24 @@ class ChatRoomViewSet(viewsets.ReadOnlyModelViewSet,     # لا نحتاج updat
                 .select_related("community", "created_by")
                 .order_by("-created_at"))
 
+    def get_version_scopes(self):
+        if self.action != "list":
+            return []
+        community_id = self.request.query_params.get("community_id")
+        return [f"rooms:community_{community_id}",
+                f"memberships:user_{self.request.user.pk}"]
+
         # -------- list ----------
     def list(self, request, *args, **kwargs):
+        return self.conditional(request, lambda: self._list(request))
+
+    def _list(self, request):
         community_id = request.query_params.get("community_id")
         if not community_id:
             return Response({"detail": "يجب تحديد community_id."},
                             status=status.HTTP_400_BAD_REQUEST)
 
-        community  = get_object_or_404(Community, id=community_id)
-        membership = get_object_or_404(UserCommunity,
-                                       user=request.user,
-                                       community=community)
-
-        allowed = allowed_types(membership.level, request.user.user_type)
-
-        rooms = community.chat_rooms.filter(type__in=allowed)
+        rooms = ChatRoom.objects.filter(id__in=allowed_room_ids_or_404(request, community_id))
 
         if room_type := request.query_params.get("type"):
             rooms = rooms.filter(type=room_type)
@@ -72,14 +81,30 @@ class ChatRoomViewSet(viewsets.ReadOnlyModelViewSet,     # لا نحتاج updat
 
 
 # ─────────────────────────── Thread ────────────────────────────
-class ThreadViewSet(viewsets.ModelViewSet):
+class ThreadViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     serializer_class   = ThreadSerializer
     permission_classes = [IsAuthenticated, IsCommunityMember, IsOwnerOrReadOnly]
+    pagination_class   = ThreadCursorPagination
+
+    # القائمة تُرجع بطاقات خفيفة، والشجرة الكاملة فقط في retrieve
+    def get_serializer_class(self):
+        if self.action == "list":
+            return ThreadListSerializer
+        return ThreadSerializer
+
+    def get_version_scopes(self):
+        if self.action == "retrieve":
+            return [f"thread_{self.kwargs['pk']}",
+                    f"memberships:user_{self.request.user.pk}"]
+        community_id = self.request.query_params.get("community_id")
+        return [f"threads:community_{community_id}",
+                f"memberships:user_{self.request.user.pk}"]
 
     def get_queryset(self):
-        qs = (Thread.objects
-              .select_related("chat_room__community", "created_by")
-              .prefetch_related("stars"))
+        qs = with_thread_like_meta(
+            Thread.objects.select_related("chat_room__community", "created_by"),
+            self.request.user,
+        )
         #   السماح لعملية retrieve بدون community_id
         if self.action not in ("list", "create"):
             return qs
@@ -89,11 +114,8 @@ class ThreadViewSet(viewsets.ModelViewSet):
         if not community_id:
             return qs.none()          # أو ارفع خطأ 400 إذا تفضّل
 
-        community  = get_object_or_404(Community, id=community_id)
-        membership = get_object_or_404(UserCommunity,
-                                       user=self.request.user,
-                                       community=community)
-        
+        room_ids = allowed_room_ids_or_404(self.request, community_id)
+
         room_id   = self.request.query_params.get("room_id")
         room_type = self.request.query_params.get("room_type")
 
@@ -102,25 +124,20 @@ class ThreadViewSet(viewsets.ModelViewSet):
         elif room_type:
             qs = qs.filter(chat_room__type=room_type)
 
-        allowed = allowed_types(membership.level, self.request.user.user_type)
-
-        qs = qs.filter(chat_room__community=community,
-                       chat_room__type__in=allowed)
+        # الغرف المسموح بها (المجتمع + المستوى) محسوبة مسبقًا في خريطة العضويات
+        qs = qs.filter(chat_room_id__in=room_ids)
 
         if flag := self.request.query_params.get("is_job_opportunity"):
             qs = qs.filter(is_job_opportunity=flag.lower() == "true")
 
-        return qs.order_by("-created_at")
+        return qs.order_by("-created_at", "-id")
 
     # منع إنشاء ثريد في مجتمع غريب
     def perform_create(self, serializer):
         chat_room = serializer.validated_data["chat_room"]
-        if not UserCommunity.objects.filter(user=self.request.user,
-                                            community=chat_room.community).exists():
+        if community_level(self.request, chat_room.community_id) is None:
             raise PermissionDenied("لست عضوًا في هذا المجتمع.")
         serializer.save(created_by=self.request.user)
-
-        serializer.save(created_by=self.request.user)
         
     def perform_update(self, serializer):
         thread = self.get_object()
@@ -133,40 +150,79 @@ class ThreadViewSet(viewsets.ModelViewSet):
 
 # ─────────────────────────── Reply ─────────────────────────────
 class ReplyViewSet(viewsets.ModelViewSet):
+    """
+    - GET /api/replies/by-thread/?community_id=&thread_id=  → الردود العليا للثريد (صفحات)
+    - GET /api/replies/{id}/children/?community_id=         → أبناء رد معيّن (صفحات)
+    - GET /api/replies/{id}/?community_id=                  → الرد مع فرعه كاملًا
+    """
     serializer_class   = ReplySerializer
     permission_classes = [IsAuthenticated, IsCommunityMember]
 
+    def get_serializer_class(self):
+        if self.action in ("by_thread", "children"):
+            return ReplyListSerializer
+        return ReplySerializer
+
     def get_queryset(self):
-        qs = (Reply.objects
-          .select_related("thread__chat_room__community", "created_by")
-          .prefetch_related("stars"))
+        qs = with_reply_like_meta(
+            Reply.objects.select_related("thread__chat_room__community", "created_by",
+                                         "parent_reply__created_by"),
+            self.request.user,
+        )
 
         community_id = self.request.query_params.get("community_id")
         if not community_id:
              return qs.none()
 
-        community  = get_object_or_404(Community, id=community_id)
-        membership = get_object_or_404(UserCommunity,
-                                   user=self.request.user,
-                                   community=community)
-        
+        room_ids = allowed_room_ids_or_404(self.request, community_id)
+
         room_id   = self.request.query_params.get("room_id")
         room_type = self.request.query_params.get("room_type")
 
         if room_id:
-            qs = qs.filter(chat_room_id=room_id)
+            qs = qs.filter(thread__chat_room_id=room_id)
         elif room_type:
-            qs = qs.filter(chat_room__type=room_type)
-
-        allowed = allowed_types(membership.level, self.request.user.user_type)
+            qs = qs.filter(thread__chat_room__type=room_type)
 
-        return qs.filter(thread__chat_room__community=community,
-                     thread__chat_room__type__in=allowed)
+        return qs.filter(thread__chat_room_id__in=room_ids).order_by("created_at")
 
 
     def perform_create(self, serializer):
         serializer.save(created_by=self.request.user)
 
+    def retrieve(self, request, *args, **kwargs):
+        reply = self.get_object()
+        if reply.path:
+            # الفرع كله باستعلام واحد بدل استعلام لكل مستوى في get_children
+            _, reply.tree_children = load_reply_subtree(reply, request.user)
+        return Response(self.get_serializer(reply).data)
+
+    # -------- lazy loading ----------
+    @action(detail=False, methods=["get"], url_path="by-thread")
+    def by_thread(self, request):
+        thread_id = request.query_params.get("thread_id")
+        if not thread_id:
+            return Response({"detail": "يجب تحديد thread_id."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            thread_id = int(thread_id)
+        except ValueError:
+            return Response({"detail": "قيمة thread_id غير صحيحة."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        qs = self.get_queryset().filter(thread_id=thread_id, parent_reply__isnull=True)
+        return self._cursor_page(qs)
+
+    @action(detail=True, methods=["get"])
+    def children(self, request, pk=None):
+        parent = self.get_object()
+        return self._cursor_page(self.get_queryset().filter(parent_reply=parent))
+
+    def _cursor_page(self, qs):
+        paginator = ReplyCursorPagination()
+        page = paginator.paginate_queryset(qs, self.request, view=self)
+        serializer = self.get_serializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
 
 # ─────────────────────────── Like (toggle) ─────────────────────
 
@@ -28,14 +28,13 @@ class IsCommunityMember(BasePermission):
     message = "أنت لست عضوًا في هذا المجتمع!"
 
     # ---------- أداة مساعدة خاصة ----------
-    def _extract_community(self, request):
+    def _extract_community_id(self, request):
         """
-        نحاول استنتاج كائن Community من البيانات الواردة.
+        نحاول استنتاج رقم المجتمع من البيانات الواردة.
         يقبل: community, chat_room, thread, reply
-        يرجع: كائن Community أو None
+        يرجع: community_id أو None
         """
-        from fields.models  import Community           # import هنا لتجنب الدوران
-        from ChatRoom.models import ChatRoom, Thread, Reply
+        from ChatRoom.models import ChatRoom, Thread, Reply   # import هنا لتجنب الدوران
 
         # 1) id صريح للمجتمع
         cid = request.data.get("community") or request.query_params.get("community_id")
@@ -43,38 +42,36 @@ class IsCommunityMember(BasePermission):
         if isinstance(cid, (list, tuple)):
             cid = cid[0]
         if cid:
-            return Community.objects.filter(id=cid).first()
+            return cid
 
         # 2) غرفة دردشة
         room_id = request.data.get("chat_room")
         if room_id:
-            room = ChatRoom.objects.select_related("community").filter(id=room_id).first()
-            return room.community if room else None
+            return (ChatRoom.objects.filter(id=room_id)
+                    .values_list("community_id", flat=True).first())
 
         # 3) ثريد
         thread_id = request.data.get("thread")
         if thread_id:
-            th = Thread.objects.select_related("chat_room__community").filter(id=thread_id).first()
-            return th.chat_room.community if th else None
-
+            return (Thread.objects.filter(id=thread_id)
+                    .values_list("chat_room__community_id", flat=True).first())
 
         # 4) ردّ
         reply_id = request.data.get("reply")
         if reply_id:
-            rp = Reply.objects.select_related("thread__chat_room__community").filter(id=reply_id).first()
-            return rp.thread.chat_room.community if rp else None
+            return (Reply.objects.filter(id=reply_id)
+                    .values_list("thread__chat_room__community_id", flat=True).first())
 
         return None
     # ---------------------------------------
 
     # ---- استدعاء عام (list / create) ----
     def has_permission(self, request, view):
-        community = self._extract_community(request)
-        if community is None:
+        community_id = self._extract_community_id(request)
+        if community_id is None:
             return True
-        from fields.models import UserCommunity
-        return UserCommunity.objects.filter(user=request.user,
-                                            community=community).exists()
+        from fields.membership import community_level
+        return community_level(request, community_id) is not None
 
 
     # ---- استدعاء على الكائن نفسه ----
@@ -83,19 +80,18 @@ class IsCommunityMember(BasePermission):
         بالنسبة لـ retrieve / update / destroy على كائن معيّن (ChatRoom, Thread, Reply)
         نستخلص المجتمع مباشرةً من الكائن ثم نعيد استخدام نفس منطق العضوية.
         """
-        # محاولة للوصول إلى خاصية community في الكائن أو في السلاسل المرتبطة
-        community = getattr(obj, "community", None)
-        if community is None and hasattr(obj, "chat_room"):
-            community = obj.chat_room.community
-        if community is None and hasattr(obj, "thread"):
-            community = obj.thread.chat_room.community
-
-        if community is None:
+        # محاولة للوصول إلى رقم المجتمع في الكائن أو في السلاسل المرتبطة
+        community_id = getattr(obj, "community_id", None)
+        if community_id is None and hasattr(obj, "chat_room"):
+            community_id = obj.chat_room.community_id
+        if community_id is None and hasattr(obj, "thread"):
+            community_id = obj.thread.chat_room.community_id
+
+        if community_id is None:
             return False
 
-        from fields.models import UserCommunity
-        return UserCommunity.objects.filter(user=request.user,
-                                            community=community).exists()
+        from fields.membership import community_level
+        return community_level(request, community_id) is not None
     
 class IsOwnerOrReadOnly(BasePermission):
     """
@@ -1,6 +1,49 @@
+from urllib.parse import parse_qs
+
+from channels.db import database_sync_to_async
 from channels.generic.websocket import AsyncJsonWebsocketConsumer
+from django.conf import settings
+
+from . import feed
+from .serializers import serialize_feed
+
+BACKLOG_SIZE = getattr(settings, "ALERTS_BACKLOG_SIZE", 20)
+
+
+def _int_param(params, name):
+    try:
+        return int(params[name][0])
+    except (KeyError, IndexError, ValueError):
+        return None
+
+
+def as_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+@database_sync_to_async
+def load_backlog(user, after_id=None, after_broadcast_id=None) -> dict:
+    """
+    عدد غير المقروء + أحدث BACKLOG_SIZE تنبيهات غير مقروءة (أحدث من آخر ما رآه
+    العميل) في رسالة واحدة — كل الاستعلامات في قفزة واحدة إلى خيط قاعدة البيانات.
+    """
+    keys = list(feed.feed_keys(user, unread=True, after_id=after_id,
+                               after_broadcast_id=after_broadcast_id)[:BACKLOG_SIZE])
+    return {
+        "type":   "backlog",
+        "unread": feed.cached_unread_count(user),
+        "alerts": serialize_feed(feed.load_page(keys), feed.read_watermarks(user)),
+    }
+
 
 class AlertConsumer(AsyncJsonWebsocketConsumer):
+    """
+    ws/alerts/<id>/?last_seen=<alert id>&last_seen_broadcast=<broadcast id>
+    يُرسل عند الاتصال رسالة backlog ثم كل تنبيه جديد فور وصوله.
+    """
     async def connect(self):
         user = self.scope["user"]
         if user.is_anonymous:
@@ -10,8 +53,19 @@ class AlertConsumer(AsyncJsonWebsocketConsumer):
         await self.channel_layer.group_add(self.group_name, self.channel_name)
         await self.accept()
 
+        params = parse_qs(self.scope.get("query_string", b"").decode())
+        await self.send_json(await load_backlog(
+            user,
+            after_id=_int_param(params, "last_seen"),
+            after_broadcast_id=_int_param(params, "last_seen_broadcast"),
+        ))
+
     async def disconnect(self, code):
         await self.channel_layer.group_discard(self.group_name, self.channel_name)
 
     async def alert(self, event):
         await self.send_json(event["payload"])
+
+    # أحداث realtime الشخصية (مثل تأكيد liked_by_me من ChatRoom.realtime_signals)
+    async def broadcast(self, event):
+        await self.send_json(event["payload"])
@@ -0,0 +1,170 @@
+# alerts/feed.py
+"""
+User alert feed = personal Alert rows  ∪  community BroadcastAlert rows.
+
+Broadcasts are stored once per post (fan-out-on-read). Each membership has an
+AlertWatermark that hides broadcasts older than the membership and marks
+everything up to read_until_id as read.
+"""
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Max, Q, Value
+from django.db.models.functions import Greatest
+
+from alerts.models import Alert, AlertWatermark, BroadcastAlert
+from alerts.preferences import hide_muted_broadcasts
+from ChatRoom.models import ChatRoom
+from fields.membership import LEVELS
+from utils.chat import levels_allowed
+
+_WM = "community__memberships__alert_watermark"
+
+UNREAD_TIMEOUT = 24 * 60 * 60       # أي انحراف في العدّاد يُصحَّح تلقائيًا بعد يوم
+
+
+# ──────────────────────────── querysets ────────────────────────────
+def personal_alerts(user, unread=False):
+    qs = Alert.objects.filter(recipient=user)
+    if unread:
+        qs = qs.filter(is_read=False)
+    return qs
+
+
+def _visible_room_types(user) -> Q:
+    """Broadcast room_type must be open to the member's current level (utils.chat rules)."""
+    q = Q(room_type="")
+    for room_type, _ in ChatRoom.ROOM_TYPE_CHOICES:
+        levels = levels_allowed(room_type, user.user_type, LEVELS)
+        if levels:
+            q |= Q(room_type=room_type, community__memberships__level__in=levels)
+    return q
+
+
+def broadcast_alerts(user, unread=False):
+    """
+    Broadcasts visible to `user`. All conditions sit in one filter() call so
+    they share a single join to the member's UserCommunity / AlertWatermark.
+    """
+    conditions = {
+        "community__memberships__user": user,
+        "id__gt": F(f"{_WM}__start_id"),
+    }
+    if unread:
+        conditions["id__gt"] = Greatest(F(f"{_WM}__start_id"), F(f"{_WM}__read_until_id"))
+    qs = (BroadcastAlert.objects
+          .filter(_visible_room_types(user), **conditions)
+          .exclude(actor=user))
+    return hide_muted_broadcasts(qs, user)
+
+
+def feed_keys(user, unread=False, after_id=None, after_broadcast_id=None):
+    """
+    One UNION query of (id, created_at, scope) rows, newest first — cheap to
+    count and slice for pagination; load_page() then fetches the full rows.
+    after_id / after_broadcast_id: only rows newer than the client's last seen ids.
+    """
+    personal  = personal_alerts(user, unread)
+    broadcast = broadcast_alerts(user, unread)
+    if after_id is not None:
+        personal = personal.filter(id__gt=after_id)
+    if after_broadcast_id is not None:
+        broadcast = broadcast.filter(id__gt=after_broadcast_id)
+
+    personal  = (personal
+                 .annotate(scope=Value(Alert.scope))
+                 .values("id", "created_at", "scope")
+                 .order_by())
+    broadcast = (broadcast
+                 .annotate(scope=Value(BroadcastAlert.scope))
+                 .values("id", "created_at", "scope")
+                 .order_by())
+    return personal.union(broadcast, all=True).order_by("-created_at", "-id")
+
+
+def load_page(keys):
+    """Turn a page of feed_keys() rows into Alert / BroadcastAlert objects (2 queries)."""
+    ids = {Alert.scope: [], BroadcastAlert.scope: []}
+    for row in keys:
+        ids[row["scope"]].append(row["id"])
+    loaded = {
+        Alert.scope: Alert.objects.in_bulk(ids[Alert.scope]),
+        BroadcastAlert.scope: BroadcastAlert.objects.in_bulk(ids[BroadcastAlert.scope]),
+    }
+    return [loaded[row["scope"]][row["id"]] for row in keys
+            if row["id"] in loaded[row["scope"]]]
+
+
+# ──────────────────────────── read state ───────────────────────────
+def read_watermarks(user) -> dict[int, int]:
+    """{community_id: read_until_id} — BroadcastAlertSerializer context."""
+    return dict(AlertWatermark.objects
+                .filter(membership__user=user)
+                .values_list("membership__community_id", "read_until_id"))
+
+
+def unread_count(user) -> int:
+    """Exact count from the DB (both sources)."""
+    return (personal_alerts(user, unread=True).count()
+            + broadcast_alerts(user, unread=True).count())
+
+
+# ───────────────────────── unread counter ──────────────────────────
+# عدّاد لكل مستخدم في الكاش: يُبنى من unread_count() عند غيابه، ويُزاد عند
+# إنشاء تنبيه شخصي، ويُحذف (ليُعاد بناؤه) عند البث للمجتمع وعند القراءة وتغيّر
+# العضوية وحذف التنبيهات.
+def _unread_key(user_id) -> str:
+    return f"alerts:unread:user_{user_id}"
+
+
+def cached_unread_count(user) -> int:
+    key   = _unread_key(user.pk)
+    count = cache.get(key)
+    if count is None:
+        count = unread_count(user)
+        cache.add(key, count, UNREAD_TIMEOUT)
+    return count
+
+
+def incr_unread(user_ids) -> None:
+    """+1 لكل مستخدم بعد الـcommit؛ المفتاح الغائب يبقى غائبًا (يُعاد بناؤه عند الطلب)."""
+    user_ids = list(user_ids)
+
+    def _incr():
+        for user_id in user_ids:
+            try:
+                cache.incr(_unread_key(user_id))
+            except ValueError:
+                pass
+    transaction.on_commit(_incr)
+
+
+def forget_unread(user) -> None:
+    cache.delete(_unread_key(user.pk))
+
+
+def forget_unread_many(user_ids) -> None:
+    """حذف عدّادات مجموعة مستخدمين بعد الـcommit في طلب كاش واحد (delete_many)."""
+    keys = [_unread_key(user_id) for user_id in user_ids]
+    if keys:
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def mark_broadcast_read(user, broadcast: BroadcastAlert) -> None:
+    """
+    Advance the member's watermark to this broadcast. Older broadcasts of the
+    same community are covered too (a watermark is a position, not a set).
+    """
+    (AlertWatermark.objects
+     .filter(membership__user=user, membership__community_id=broadcast.community_id)
+     .update(read_until_id=Greatest(F("read_until_id"), broadcast.id)))
+    forget_unread(user)
+
+
+def mark_all_read(user) -> int:
+    """Mark the whole merged feed as read. Returns how many items changed."""
+    updated = broadcast_alerts(user, unread=True).count()
+    top = BroadcastAlert.objects.aggregate(top=Max("id"))["top"] or 0
+    AlertWatermark.objects.filter(membership__user=user).update(read_until_id=top)
+    updated += personal_alerts(user, unread=True).update(is_read=True)
+    transaction.on_commit(lambda: cache.set(_unread_key(user.pk), 0, UNREAD_TIMEOUT))
+    return updated
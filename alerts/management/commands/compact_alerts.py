@@ -0,0 +1,151 @@
+import json
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.db.models import Exists, OuterRef, Sum
+from django.db.models.functions import Length
+from django.utils import timezone
+
+from alerts import feed
+from alerts.models import Alert, BroadcastAlert
+from ChatRoom.models import Thread
+from fields.models import UserCommunity
+
+# Fixed columns + index entries of one alert row, added to the message length
+# when the database cannot report an average row size.
+ROW_OVERHEAD = 64
+
+
+class Command(BaseCommand):
+    help = ("Delete (or archive then delete) read alerts and community broadcasts older "
+            "than the retention window, and alerts pointing at deleted threads, in small batches.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int,
+                            default=getattr(settings, "ALERTS_RETENTION_DAYS", 90),
+                            help="Keep read alerts and broadcasts younger than this "
+                                 "(default ALERTS_RETENTION_DAYS).")
+        parser.add_argument("--batch-size", type=int, default=1000,
+                            help="Rows deleted per transaction (default 1000).")
+        parser.add_argument("--pause", type=float, default=0.0,
+                            help="Seconds to sleep between batches to let replicas catch up.")
+        parser.add_argument("--archive", metavar="PATH",
+                            help="Append every deleted row to this JSON-lines file first.")
+        parser.add_argument("--dry-run", action="store_true",
+                            help="Count what would be removed without deleting.")
+
+    def handle(self, *args, **options):
+        self.batch_size = options["batch_size"]
+        self.pause      = options["pause"]
+        self.dry_run    = options["dry_run"]
+        # a dry run never writes anything, the archive included
+        archive = options["archive"] and not self.dry_run
+        self.archive    = open(options["archive"], "a", encoding="utf-8") if archive else None
+
+        # whose cached unread badge may count a row we delete (alerts.feed)
+        self.recipients  = set()
+        self.communities = set()
+
+        cutoff = timezone.now() - timedelta(days=options["days"])
+        thread_gone = ~Exists(Thread.objects.filter(pk=OuterRef("object_id")))
+
+        jobs = [
+            ("read alerts",       Alert.objects.filter(is_read=True, created_at__lt=cutoff)),
+            ("orphan alerts",     Alert.objects.filter(object_id__isnull=False).filter(thread_gone)),
+            # Watermarks are positions, not row references: old broadcasts go
+            # regardless of who has read them (an idle member never blocks the purge).
+            ("old broadcasts",    BroadcastAlert.objects.filter(created_at__lt=cutoff)),
+            ("orphan broadcasts", BroadcastAlert.objects.filter(object_id__isnull=False)
+                                                        .filter(thread_gone)),
+        ]
+        try:
+            total_rows = total_bytes = 0
+            for label, qs in jobs:
+                rows, size = self._purge(qs)
+                total_rows  += rows
+                total_bytes += size
+                self.stdout.write(f"  {label:<18} {rows:>8} rows  ≈{_human(size)}")
+        finally:
+            if self.archive:
+                self.archive.close()
+            self._forget_unread()
+
+        verb = "Would reclaim" if self.dry_run else "Reclaimed"
+        self.stdout.write(self.style.SUCCESS(
+            f"✓ {verb} {total_rows} rows, ≈{_human(total_bytes)}"
+        ))
+
+    # ------------------------------------------------------------------ #
+    def _purge(self, qs):
+        """Delete qs by primary key in batches; each batch is its own short transaction."""
+        model    = qs.model
+        avg_row  = _avg_row_bytes(model)
+        rows = size = 0
+        last_pk  = 0
+        while True:
+            # keyset scan: never re-reads rows skipped in a dry run
+            pks = list(qs.filter(pk__gt=last_pk).order_by("pk")
+                         .values_list("pk", flat=True)[:self.batch_size])
+            if not pks:
+                return rows, size
+            last_pk = pks[-1]
+
+            with transaction.atomic():
+                batch = model.objects.filter(pk__in=pks)
+                if avg_row:
+                    size += avg_row * len(pks)
+                else:
+                    text = batch.aggregate(n=Sum(Length("message")))["n"] or 0
+                    size += text + ROW_OVERHEAD * len(pks)
+                if self.archive:
+                    for row in batch.values():
+                        row["model"] = model._meta.label
+                        self.archive.write(json.dumps(row, cls=DjangoJSONEncoder, ensure_ascii=False) + "\n")
+                if not self.dry_run:
+                    self._note_unread(model, batch)
+                    batch.delete()
+            rows += len(pks)
+
+            if self.pause:
+                time.sleep(self.pause)
+
+
+    def _note_unread(self, model, batch):
+        if model is Alert:
+            self.recipients.update(batch.filter(is_read=False).values_list("recipient_id", flat=True))
+        else:
+            self.communities.update(batch.values_list("community_id", flat=True))
+
+    def _forget_unread(self):
+        members = (UserCommunity.objects.filter(community_id__in=self.communities)
+                   .values_list("user_id", flat=True).distinct()) if self.communities else []
+        user_ids = list(self.recipients | set(members))
+        for i in range(0, len(user_ids), self.batch_size):
+            feed.forget_unread_many(user_ids[i:i + self.batch_size])
+
+
+def _avg_row_bytes(model) -> int | None:
+    """InnoDB's own estimate (data + indexes per row) on MySQL; None elsewhere."""
+    if connection.vendor != "mysql":
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT (DATA_LENGTH + INDEX_LENGTH) / NULLIF(TABLE_ROWS, 0) "
+            "FROM information_schema.TABLES "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+            [model._meta.db_table],
+        )
+        row = cursor.fetchone()
+    return int(row[0]) if row and row[0] else None
+
+
+def _human(size: int) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TB"
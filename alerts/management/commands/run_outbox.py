@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from alerts import outbox
+
+
+class Command(BaseCommand):
+    help = "Deliver queued alert / realtime side effects from the outbox table."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=100,
+                            help="Events picked per transaction (default 100).")
+        parser.add_argument("--poll-interval", type=float, default=0.1,
+                            help="Seconds to sleep when the outbox is empty (default 0.1).")
+        parser.add_argument("--once", action="store_true",
+                            help="Drain what is due now and exit (for cron).")
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        total = 0
+        while True:
+            picked = outbox.drain(batch_size)
+            total += picked
+            if picked:
+                continue
+            if options["once"]:
+                break
+            time.sleep(options["poll_interval"])
+
+        self.stdout.write(self.style.SUCCESS(f"✓ Processed {total} outbox events"))
@@ -0,0 +1,49 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from alerts import feed, outbox
+from alerts.models import AlertPreference
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = "Push one summary message to every user who chose digest delivery for some alert types."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--hours", type=int, default=24,
+                            help="Summarise unread alerts created in this many hours (default 24).")
+
+    def handle(self, *args, **options):
+        since = timezone.now() - timedelta(hours=options["hours"])
+
+        digest_types = defaultdict(list)
+        for user_id, alert_type in (AlertPreference.objects
+                                    .filter(mode=AlertPreference.DIGEST)
+                                    .values_list("user_id", "type")):
+            digest_types[user_id].append(alert_type)
+
+        sent = 0
+        for user in User.objects.filter(pk__in=digest_types).iterator():
+            types  = digest_types[user.pk]
+            unread = (feed.personal_alerts(user, unread=True)
+                      .filter(type__in=types, created_at__gte=since).count()
+                      + feed.broadcast_alerts(user, unread=True)
+                      .filter(type__in=types, created_at__gte=since).count())
+            if not unread:
+                continue
+            with transaction.atomic():
+                outbox.send(f"user_{user.pk}", {"type": "alert", "payload": {
+                    "scope":  "digest",
+                    "types":  types,
+                    "unread": unread,
+                    "since":  since.isoformat(),
+                }})
+            sent += 1
+
+        self.stdout.write(self.style.SUCCESS(f"✓ Queued {sent} digests"))
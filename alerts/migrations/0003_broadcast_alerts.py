@@ -0,0 +1,57 @@
+# Generated by Django 5.1.7 on 2026-10-18 18:57
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def create_watermarks(apps, schema_editor):
+    """كل عضوية موجودة تبدأ من أول البث (لا يوجد بث قبل هذه الهجرة)."""
+    UserCommunity  = apps.get_model("fields", "UserCommunity")
+    AlertWatermark = apps.get_model("alerts", "AlertWatermark")
+    ids = UserCommunity.objects.values_list("id", flat=True).iterator(chunk_size=1000)
+    batch = []
+    for membership_id in ids:
+        batch.append(AlertWatermark(membership_id=membership_id))
+        if len(batch) >= 1000:
+            AlertWatermark.objects.bulk_create(batch)
+            batch = []
+    AlertWatermark.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('alerts', '0002_outboxevent'),
+        ('fields', '0002_alter_usercommunity_level'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AlertWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start_id', models.PositiveBigIntegerField(default=0)),
+                ('read_until_id', models.PositiveBigIntegerField(default=0)),
+                ('membership', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='alert_watermark', to='fields.usercommunity')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='BroadcastAlert',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('type', models.CharField(choices=[('info', 'Info'), ('warn', 'Warning'), ('job', 'Job post'), ('reply', 'Reply')], default='info', max_length=10)),
+                ('object_id', models.PositiveIntegerField(blank=True, null=True)),
+                ('message', models.TextField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('actor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('community', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='broadcast_alerts', to='fields.community')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['community', '-created_at'], name='alerts_broa_communi_9beb84_idx')],
+            },
+        ),
+        migrations.RunPython(create_watermarks, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-18 19:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('alerts', '0003_broadcast_alerts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='alert',
+            name='count',
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.1.7 on 2026-10-18 19:01
+
+from django.db import migrations, models
+
+
+def backfill_room_type(apps, schema_editor):
+    BroadcastAlert = apps.get_model("alerts", "BroadcastAlert")
+    Thread         = apps.get_model("ChatRoom", "Thread")
+    rooms = dict(Thread.objects
+                 .filter(pk__in=BroadcastAlert.objects.values("object_id"))
+                 .values_list("pk", "chat_room__type"))
+    for alert in BroadcastAlert.objects.filter(object_id__in=rooms).only("id", "object_id"):
+        alert.room_type = rooms[alert.object_id]
+        alert.save(update_fields=["room_type"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('alerts', '0004_alert_count'),
+        ('ChatRoom', '0006_reply_path'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='broadcastalert',
+            name='room_type',
+            field=models.CharField(blank=True, max_length=30),
+        ),
+        migrations.RunPython(backfill_room_type, migrations.RunPython.noop),
+    ]
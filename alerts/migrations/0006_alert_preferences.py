@@ -0,0 +1,44 @@
+# Generated by Django 5.1.7 on 2026-10-18 19:02
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ChatRoom', '0006_reply_path'),
+        ('alerts', '0005_broadcast_room_type'),
+        ('fields', '0002_alter_usercommunity_level'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AlertMute',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('room_type', models.CharField(blank=True, max_length=30)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('community', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='fields.community')),
+                ('thread', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='ChatRoom.thread')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='alert_mutes', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'community'], name='alerts_aler_user_id_adf00f_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='AlertPreference',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('type', models.CharField(choices=[('info', 'Info'), ('warn', 'Warning'), ('job', 'Job post'), ('reply', 'Reply')], max_length=10)),
+                ('mode', models.CharField(choices=[('immediate', 'Immediate'), ('digest', 'Digest'), ('off', 'Off')], default='immediate', max_length=10)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='alert_preferences', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('user', 'type')},
+            },
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 
 User = get_user_model()
 
@@ -10,11 +11,20 @@ class Alert(models.Model):
     REPLY = "reply"
     TYPES = [(INFO, "Info"), (WARN, "Warning"), (JOB, "Job post"), (REPLY, "Reply")]
 
+    scope = "user"                      # personal row (see BroadcastAlert)
+
     recipient   = models.ForeignKey(User, on_delete=models.CASCADE, related_name="alerts")
     type        = models.CharField(max_length=10, choices=TYPES, default=INFO)
     # optional payload id (thread id, reply id …)
     object_id   = models.PositiveIntegerField(null=True, blank=True)
-    message     = models.TextField()
+    # template code (alerts/rendering.py) rendered with the actor + object at read
+    # time; message is only stored for free-text alerts without a template
+    template    = models.CharField(max_length=30, blank=True)
+    actor       = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True,
+                                    related_name="+")
+    message     = models.TextField(blank=True)
+    # how many events were coalesced into this row (alerts.signals)
+    count       = models.PositiveIntegerField(default=1)
     created_at  = models.DateTimeField(auto_now_add=True)
     is_read     = models.BooleanField(default=False)
 
@@ -23,3 +33,112 @@ class Alert(models.Model):
             models.Index(fields=["recipient", "is_read", "-created_at"]),
         ]
         ordering = ["-created_at"]
+
+
+class BroadcastAlert(models.Model):
+    """
+    Community-wide alert (new thread / job post) stored once instead of one
+    Alert row per member. It is merged into each member's feed at read time
+    (alerts/feed.py) and its read state comes from the member's AlertWatermark.
+    """
+    scope = "community"
+
+    community   = models.ForeignKey("fields.Community", on_delete=models.CASCADE,
+                                    related_name="broadcast_alerts")
+    # the poster: never sees their own broadcast
+    actor       = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True,
+                                    related_name="+")
+    # room type of the thread: only members whose level opens it see the alert
+    room_type   = models.CharField(max_length=30, blank=True)
+    type        = models.CharField(max_length=10, choices=Alert.TYPES, default=Alert.INFO)
+    object_id   = models.PositiveIntegerField(null=True, blank=True)
+    template    = models.CharField(max_length=30, blank=True)
+    message     = models.TextField(blank=True)
+    created_at  = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["community", "-created_at"]),
+        ]
+        ordering = ["-created_at"]
+
+
+class AlertWatermark(models.Model):
+    """
+    Per-membership read position in the community's BroadcastAlert stream.
+    Broadcast ids are monotonic, so:
+      • id <= start_id       → posted before the user joined (hidden)
+      • id <= read_until_id  → read
+    """
+    membership    = models.OneToOneField("fields.UserCommunity", on_delete=models.CASCADE,
+                                         related_name="alert_watermark")
+    start_id      = models.PositiveBigIntegerField(default=0)
+    read_until_id = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self) -> str:        # pragma: no cover
+        return f"{self.membership_id}: read until #{self.read_until_id}"
+
+
+class AlertPreference(models.Model):
+    """
+    Delivery mode per alert type. No row → IMMEDIATE.
+      • IMMEDIATE → stored + pushed over the socket
+      • DIGEST    → stored, no push; summarised by `manage.py send_alert_digests`
+      • OFF       → not created / not shown
+    """
+    IMMEDIATE = "immediate"
+    DIGEST    = "digest"
+    OFF       = "off"
+    MODES = [(IMMEDIATE, "Immediate"), (DIGEST, "Digest"), (OFF, "Off")]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="alert_preferences")
+    type = models.CharField(max_length=10, choices=Alert.TYPES)
+    mode = models.CharField(max_length=10, choices=MODES, default=IMMEDIATE)
+
+    class Meta:
+        unique_together = ("user", "type")
+
+
+class AlertMute(models.Model):
+    """
+    One muted target:
+      • thread                      → replies on that thread
+      • community                   → everything from the community
+      • community + room_type       → one room of the community
+      • room_type only              → that room type in every community
+    """
+    user      = models.ForeignKey(User, on_delete=models.CASCADE, related_name="alert_mutes")
+    community = models.ForeignKey("fields.Community", on_delete=models.CASCADE,
+                                  null=True, blank=True, related_name="+")
+    room_type = models.CharField(max_length=30, blank=True)
+    thread    = models.ForeignKey("ChatRoom.Thread", on_delete=models.CASCADE,
+                                  null=True, blank=True, related_name="+")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "community"]),
+        ]
+
+
+class OutboxEvent(models.Model):
+    """
+    Side effect (alert fan-out, WebSocket broadcast …) recorded in the same
+    transaction as the change that caused it, then delivered by
+    `python manage.py run_outbox` (see alerts/outbox.py).
+    """
+    topic        = models.CharField(max_length=50)
+    payload      = models.JSONField(default=dict)
+    attempts     = models.PositiveSmallIntegerField(default=0)
+    available_at = models.DateTimeField(default=timezone.now)
+    last_error   = models.TextField(blank=True)
+    created_at   = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["attempts", "available_at"]),
+        ]
+        ordering = ["id"]
+
+    def __str__(self) -> str:        # pragma: no cover
+        return f"{self.topic} #{self.pk} (attempts={self.attempts})"
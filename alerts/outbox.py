@@ -0,0 +1,215 @@
+# alerts/outbox.py
+"""
+Transactional outbox for side effects that used to run inside the request.
+
+• Signal receivers call `enqueue()` / `send()` — a plain INSERT into
+  OutboxEvent within the caller's transaction, so the event exists iff the
+  change committed.
+• `drain()` (driven by `manage.py run_outbox`) picks events in batches,
+  runs the registered topic handlers and pushes channel-layer messages.
+  Failures are retried with exponential backoff; after MAX_ATTEMPTS the
+  event is logged at error level and deleted (dead letter).
+
+Only the SEND_TOPIC events talk to Redis; handlers for other topics do their
+DB work and queue their own SEND_TOPIC events, so a Redis blip never
+re-runs a fan-out.
+"""
+import asyncio
+import json
+import logging
+from collections import defaultdict
+from datetime import timedelta
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+
+from alerts.models import OutboxEvent
+from utils import replay
+
+logger = logging.getLogger("outbox")
+
+SEND_TOPIC   = "channels.send"
+MAX_ATTEMPTS = 10
+MAX_BACKOFF  = 300          # seconds
+SEND_LEASE   = 60           # seconds a picked SEND_TOPIC event stays hidden while it is sent
+
+_handlers = {}
+
+
+# ──────────────────────────── producers ────────────────────────────
+def handler(topic: str):
+    """Register the function that processes events of `topic`."""
+    def register(func):
+        _handlers[topic] = func
+        return func
+    return register
+
+
+def enqueue(topic: str, *, delay: float = 0, **payload) -> None:
+    """`delay` (seconds) postpones the event, e.g. to let a burst settle first."""
+    OutboxEvent.objects.create(topic=topic, payload=payload,
+                               available_at=timezone.now() + timedelta(seconds=delay))
+
+
+def is_pending(topic: str, **payload) -> bool:
+    """
+    An event of `topic` with this exact payload is queued and not yet due, so
+    no worker can have picked it up: its handler is guaranteed to run later
+    and see the caller's change. Once due it may already be in flight, and
+    the caller must enqueue a new one.
+    """
+    return OutboxEvent.objects.filter(topic=topic, payload=payload,
+                                      available_at__gt=timezone.now()).exists()
+
+
+def send_many(messages: list[tuple[str, dict]]) -> None:
+    """
+    Queue channel-layer messages [(group, message), …] as one event.
+    Each message is stamped with its group so a consumer subscribed to several
+    groups (ChatRoom.consumers.StreamConsumer) can tell where it came from.
+    """
+    if messages:
+        enqueue(SEND_TOPIC, messages=[{"group": g, "message": {**m, "group": g}}
+                                      for g, m in messages])
+
+
+def send(group: str, message: dict) -> None:
+    send_many([(group, message)])
+
+
+# ──────────────────────────── worker ───────────────────────────────
+def _backoff(attempts: int) -> timedelta:
+    return timedelta(seconds=min(2 ** attempts, MAX_BACKOFF))
+
+
+def _stamp(event: OutboxEvent) -> None:
+    """
+    Give every realtime broadcast its group sequence number (utils.replay) once;
+    the stamped payload is kept on the row, so a retry re-sends the same seq.
+    """
+    if event.payload.get("stamped"):
+        return
+    for m in event.payload["messages"]:
+        message = m["message"]
+        if message.get("type") == "broadcast":
+            message["payload"] = replay.stamp(m["group"], message["payload"])
+    event.payload["stamped"] = True
+
+
+def _deliver(events: list[OutboxEvent]) -> list[BaseException | None]:
+    """
+    Push every message of every SEND_TOPIC event in one event-loop hop.
+    Groups are sent concurrently, but each group's messages go out one at a
+    time in event order — the order _stamp() numbered them — so a client that
+    drops any seq <= the last one it handled never sees N+1 before N. After a
+    failure the rest of that group is held back and retried with its event.
+    """
+    layer  = get_channel_layer()
+    errors = [None] * len(events)
+    queues = defaultdict(list)               # group → [(event index, message)]
+    for i, event in enumerate(events):
+        for m in event.payload["messages"]:
+            queues[m["group"]].append((i, m["message"]))
+
+    async def _group(group, queue):
+        for n, (i, message) in enumerate(queue):
+            try:
+                await layer.group_send(group, message)
+            except Exception as exc:         # noqa: BLE001
+                for j, _ in queue[n:]:
+                    errors[j] = errors[j] or exc
+                return
+
+    async def _all():
+        await asyncio.gather(*(_group(g, q) for g, q in queues.items()))
+
+    if events:
+        async_to_sync(_all)()
+    return errors
+
+
+def drain(batch_size: int = 100) -> int:
+    """
+    Process one batch of due events. Returns how many were picked.
+
+    Handlers run inside the picking transaction (their DB work commits with
+    the event's removal). SEND_TOPIC events are stamped and leased for
+    SEND_LEASE seconds, then that transaction commits, so no row lock is
+    held while talking to Redis; a worker that dies mid-send leaves the
+    events to be picked up again once the lease runs out.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        events = list(
+            OutboxEvent.objects
+            .select_for_update(skip_locked=True)
+            .filter(attempts__lt=MAX_ATTEMPTS, available_at__lte=now)
+            .order_by("id")[:batch_size]
+        )
+        if not events:
+            return 0
+
+        done, failed, sends = [], [], []
+
+        for event in events:
+            if event.topic == SEND_TOPIC:
+                continue
+            try:
+                with transaction.atomic():           # savepoint per event
+                    _handlers[event.topic](**event.payload)
+            except Exception as exc:                 # noqa: BLE001
+                failed.append((event, exc))
+            else:
+                done.append(event.pk)
+
+        for event in events:
+            if event.topic != SEND_TOPIC:
+                continue
+            try:
+                _stamp(event)
+            except Exception as exc:                 # noqa: BLE001
+                failed.append((event, exc))
+            else:
+                event.available_at = now + timedelta(seconds=SEND_LEASE)
+                sends.append(event)
+        OutboxEvent.objects.bulk_update(sends, ["payload", "available_at"])
+        _settle(done, failed, now)
+
+    done, failed = [], []
+    for event, error in zip(sends, _deliver(sends)):
+        if error is None:
+            done.append(event.pk)
+        else:
+            failed.append((event, error))
+    _settle(done, failed, timezone.now())
+
+    return len(events)
+
+
+def _settle(done: list[int], failed: list, now) -> None:
+    """
+    Delete finished events; reschedule failed ones with backoff. An event
+    failing its MAX_ATTEMPTS-th time is dead-lettered: logged at error level
+    with its payload, then deleted, so the table never keeps exhausted rows.
+    """
+    OutboxEvent.objects.filter(pk__in=done).delete()
+    retry, dead = [], []
+    for event, exc in failed:
+        event.attempts    += 1
+        event.available_at = now + _backoff(event.attempts)
+        event.last_error   = repr(exc)[:1000]
+        if event.attempts >= MAX_ATTEMPTS:
+            dead.append(event.pk)
+            logger.error("outbox event %s dropped after %s attempts (%s): %r payload=%s",
+                         event.pk, event.attempts, event.topic, exc,
+                         json.dumps(event.payload, cls=DjangoJSONEncoder, ensure_ascii=False))
+        else:
+            retry.append(event)
+            logger.warning("outbox event %s failed (%s): %r", event.pk, event.topic, exc)
+    if retry:
+        OutboxEvent.objects.bulk_update(retry, ["attempts", "available_at", "last_error", "payload"])
+    if dead:
+        OutboxEvent.objects.filter(pk__in=dead).delete()
@@ -0,0 +1,71 @@
+# alerts/preferences.py
+"""
+User notification preferences (AlertMute / AlertPreference) as query
+conditions, so alerts.signals prunes recipients before any Alert row or
+channel message exists, and alerts.feed hides what the user switched off.
+"""
+from django.db.models import Exists, OuterRef, Q
+
+from alerts.models import AlertMute, AlertPreference
+
+
+def _mute_target(community_id, room_type, thread_id=None) -> Q:
+    q = (Q(community_id=community_id, room_type="")
+         | Q(community_id=community_id, room_type=room_type)
+         | Q(community__isnull=True, room_type=room_type))
+    if thread_id is not None:
+        q |= Q(thread_id=thread_id)
+    return q
+
+
+def muted(user_ref, community_id, room_type, thread_id=None):
+    """AlertMute rows silencing this target for user_ref (id or OuterRef)."""
+    return AlertMute.objects.filter(_mute_target(community_id, room_type, thread_id),
+                                    user_id=user_ref)
+
+
+def preference(user_ref, alert_type, modes):
+    return AlertPreference.objects.filter(user_id=user_ref, type=alert_type, mode__in=modes)
+
+
+# ─────────────────────────── write side ────────────────────────────
+def push_recipients(member_qs, alert_type, community_id, room_type):
+    """
+    Narrow a UserCommunity queryset to members who want an immediate push:
+    not muted and not DIGEST/OFF for alert_type — all inside the same query.
+    """
+    user = OuterRef("user_id")
+    return (member_qs
+            .exclude(Exists(muted(user, community_id, room_type)))
+            .exclude(Exists(preference(user, alert_type,
+                                       [AlertPreference.DIGEST, AlertPreference.OFF]))))
+
+
+def digest_recipients(member_qs, alert_type, community_id, room_type):
+    """Members who keep alert_type for the digest: counted in the badge, not pushed."""
+    user = OuterRef("user_id")
+    return (member_qs
+            .exclude(Exists(muted(user, community_id, room_type)))
+            .filter(Exists(preference(user, alert_type, [AlertPreference.DIGEST]))))
+
+
+def delivery_mode(user_id, alert_type, community_id, room_type, thread_id=None) -> str:
+    """Mode for a single recipient (personal alerts); a mute counts as OFF."""
+    if muted(user_id, community_id, room_type, thread_id).exists():
+        return AlertPreference.OFF
+    mode = (AlertPreference.objects.filter(user_id=user_id, type=alert_type)
+            .values_list("mode", flat=True).first())
+    return mode or AlertPreference.IMMEDIATE
+
+
+# ─────────────────────────── read side ─────────────────────────────
+def hide_muted_broadcasts(qs, user):
+    """BroadcastAlert queryset without muted targets or types switched OFF."""
+    mutes = AlertMute.objects.filter(
+        Q(community_id=OuterRef("community_id"), room_type="")
+        | Q(community_id=OuterRef("community_id"), room_type=OuterRef("room_type"))
+        | Q(community__isnull=True, room_type=OuterRef("room_type")),
+        user=user,
+    )
+    off = preference(user.pk, OuterRef("type"), [AlertPreference.OFF])
+    return qs.exclude(Exists(mutes)).exclude(Exists(off))
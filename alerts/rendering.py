@@ -0,0 +1,73 @@
+# alerts/rendering.py
+"""
+Alerts are stored as a template code + actor / object ids; the text is
+rendered when serialized. prepare() loads every actor and thread of a page
+in two queries, so renamed threads and users show their current names.
+"""
+from django.contrib.auth import get_user_model
+
+from ChatRoom.models import Thread
+
+User = get_user_model()
+
+THREAD_CREATED = "thread_created"
+JOB_POSTED     = "job_posted"
+THREAD_REPLY   = "thread_reply"
+JOB_COMMENT    = "job_comment"
+
+# code → (single event, coalesced events with {count})
+TEMPLATES = {
+    THREAD_CREATED: ("{actor} started a new thread: {title}", None),
+    JOB_POSTED:     ("{actor} posted a new job opportunity: {title}", None),
+    THREAD_REPLY:   ("{actor} replied to your thread: {title}",
+                     "{count} new replies to your thread: {title}"),
+    JOB_COMMENT:    ("{actor} commented on your job post: {title}",
+                     "{count} new comments on your job post: {title}"),
+}
+
+DELETED_TITLE = "a deleted thread"
+
+
+def display_name(user) -> str:
+    """
+    Return a human-friendly name for notifications:
+    1) full name  2) profile.name  3) e-mail
+    """
+    if user is None:
+        return "Someone"
+    full = user.get_full_name()
+    if full:
+        return full.strip()
+    if hasattr(user, "profile") and user.profile.name:
+        return user.profile.name
+    return user.email
+
+
+def prepare(alerts) -> None:
+    """Render every alert of the batch (Alert / BroadcastAlert) into alert.rendered."""
+    templated = [a for a in alerts if a.template]
+    actors  = User.objects.select_related("profile").in_bulk(
+        {a.actor_id for a in templated if a.actor_id})
+    titles  = dict(Thread.objects
+                   .filter(pk__in={a.object_id for a in templated if a.object_id})
+                   .values_list("pk", "title"))
+
+    for alert in alerts:
+        alert.rendered = _render(alert, actors, titles) if alert.template else alert.message
+
+
+def render(alert) -> str:
+    if not hasattr(alert, "rendered"):
+        prepare([alert])
+    return alert.rendered
+
+
+def _render(alert, actors, titles) -> str:
+    single, many = TEMPLATES[alert.template]
+    count = getattr(alert, "count", 1)
+    text  = many if count > 1 and many else single
+    return text.format(
+        actor=display_name(actors.get(alert.actor_id)),
+        title=titles.get(alert.object_id, DELETED_TITLE),
+        count=count,
+    )
@@ -1,7 +1,77 @@
 from rest_framework import serializers
-from .models import Alert
+from ChatRoom.models import ChatRoom
+from .models import Alert, AlertMute, AlertPreference, BroadcastAlert
+from .rendering import prepare, render
 
 class AlertSerializer(serializers.ModelSerializer):
+    """message is rendered from template + actor + thread (call rendering.prepare on a batch first)."""
+    scope   = serializers.ReadOnlyField()
+    message = serializers.SerializerMethodField()
+
     class Meta:
         model = Alert
-        fields = ['id', 'message', 'created_at', 'is_read', 'type', 'object_id']
\ No newline at end of file
+        fields = ['id', 'message', 'created_at', 'is_read', 'type', 'object_id', 'scope', 'count']
+
+    def get_message(self, obj):
+        return render(obj)
+
+
+class BroadcastAlertSerializer(serializers.ModelSerializer):
+    """
+    Same shape as AlertSerializer. is_read comes from the member's watermark:
+    context["watermarks"] = {community_id: read_until_id} (alerts.feed.read_watermarks).
+    Without it (WebSocket push of a fresh broadcast) the alert is unread.
+    """
+    scope   = serializers.ReadOnlyField()
+    message = serializers.SerializerMethodField()
+    is_read = serializers.SerializerMethodField()
+    count   = serializers.IntegerField(read_only=True, default=1)
+
+    class Meta:
+        model = BroadcastAlert
+        fields = ['id', 'message', 'created_at', 'is_read', 'type', 'object_id', 'scope', 'count',
+                  'community']
+
+    def get_message(self, obj):
+        return render(obj)
+
+    def get_is_read(self, obj):
+        watermarks = self.context.get("watermarks") or {}
+        return obj.id <= watermarks.get(obj.community_id, 0)
+
+
+def serialize_feed(alerts, watermarks) -> list[dict]:
+    """Serialize a merged page (Alert + BroadcastAlert) keeping its order."""
+    prepare(alerts)
+    context = {"watermarks": watermarks}
+    return [
+        (BroadcastAlertSerializer(a, context=context) if isinstance(a, BroadcastAlert)
+         else AlertSerializer(a)).data
+        for a in alerts
+    ]
+
+
+class AlertPreferenceSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = AlertPreference
+        fields = ['type', 'mode']
+
+
+class AlertMuteSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = AlertMute
+        fields = ['id', 'community', 'room_type', 'thread', 'created_at']
+        read_only_fields = ['created_at']
+
+    def validate_room_type(self, value):
+        if value and value not in dict(ChatRoom.ROOM_TYPE_CHOICES):
+            raise serializers.ValidationError("نوع غرفة غير معروف.")
+        return value
+
+    def validate(self, attrs):
+        if attrs.get("thread"):
+            if attrs.get("community") or attrs.get("room_type"):
+                raise serializers.ValidationError("كتم الثريد لا يُجمع مع مجتمع أو نوع غرفة.")
+        elif not (attrs.get("community") or attrs.get("room_type")):
+            raise serializers.ValidationError("حدّد thread أو community و/أو room_type.")
+        return attrs
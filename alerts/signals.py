@@ -1,77 +1,145 @@
 # alerts/signals.py
-from django.db import transaction
-from django.db.models.signals import post_save
+"""
+الإشارات هنا تكتب حدثًا في جدول الـOutbox فقط (داخل نفس المعاملة)،
+والتوزيع الفعلي على الأعضاء والإرسال عبر WebSocket يتمّان في
+`manage.py run_outbox` (alerts.outbox).
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Max
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
-
-from asgiref.sync import async_to_sync
-from channels.layers import get_channel_layer
+from django.utils import timezone
 
 from ChatRoom.models import Thread, Reply
-from alerts.models import Alert
-from alerts.serializers import AlertSerializer
+from alerts import feed, outbox, rendering
+from alerts.models import Alert, AlertPreference, AlertWatermark, BroadcastAlert
+from alerts.preferences import delivery_mode, digest_recipients, push_recipients
+from alerts.serializers import AlertSerializer, BroadcastAlertSerializer
+from fields.membership import audience_q
 from fields.models import UserCommunity          # ⭐️ استيراد جديد
-layer = get_channel_layer()
+
+# عدد الأعضاء في كل دفعة إرسال WebSocket عند بث تنبيه لمجتمع كامل
+FANOUT_CHUNK_SIZE = getattr(settings, "ALERTS_FANOUT_CHUNK_SIZE", 500)
+
+# نافذة دمج التنبيهات المتكررة (نفس المستلم/النوع/الكائن) ومهلة إرسال التحديث المدمج
+COALESCE_SECONDS    = getattr(settings, "ALERTS_COALESCE_SECONDS", 300)
+COALESCE_PUSH_DELAY = getattr(settings, "ALERTS_COALESCE_PUSH_DELAY", 15)
 
 # ──────────────────────────── helpers ──────────────────────────────
-def _display_name(user) -> str:
+def _push_many(alerts: list[Alert], new: bool = True) -> None:
     """
-    Return a human-friendly name for notifications:
-    1) full name  2) profile.name  3) e-mail
+    Queue WebSocket messages for user_<id> groups as a single outbox event;
+    the worker delivers the whole chunk in one event-loop hop.
+    new=False → update of an already-counted unread alert (no badge increment).
     """
-    full = user.get_full_name()
-    if full:
-        return full.strip()
-    if hasattr(user, "profile") and user.profile.name:
-        return user.profile.name
-    return user.email
+    rendering.prepare(alerts)
+    payloads = AlertSerializer(alerts, many=True).data
+    if new:
+        feed.incr_unread(alert.recipient_id for alert in alerts)
+    outbox.send_many([
+        (f"user_{alert.recipient_id}", {"type": "alert", "payload": dict(payload)})
+        for alert, payload in zip(alerts, payloads)
+    ])
+
+
+def _create_and_push(push: bool = True, **kwargs) -> None:
+    alert = Alert.objects.create(**kwargs)
+    if push:
+        _push_many([alert])
+    else:                           # digest: يُحسب في الشارة دون إرسال فوري
+        feed.incr_unread([alert.recipient_id])
 
 
-def _push(alert: Alert) -> None:
+def _coalesce_or_create(template: str, actor, push: bool = True, **fields) -> None:
     """
-    Send alert to WebSocket group user_<id>.
-    Executed after the DB commit is finished.
+    Merge into the recipient's unread alert with the same type/object created
+    within COALESCE_SECONDS (count += 1, the template renders the aggregate);
+    otherwise create and push a new one. Merged rows are pushed once, COALESCE_PUSH_DELAY
+    seconds later, however many events arrive meanwhile (push=False → never).
     """
-    payload = AlertSerializer(alert).data
-    async_to_sync(layer.group_send)(
-        f"user_{alert.recipient_id}",
-        {"type": "alert", "payload": payload},
-    )
+    since = timezone.now() - timedelta(seconds=COALESCE_SECONDS)
+    alert = (Alert.objects.select_for_update()
+             .filter(is_read=False, created_at__gte=since, **fields)
+             .order_by("-created_at").first())
+    if alert is None:
+        _create_and_push(push, actor=actor, template=template, **fields)
+        return
 
+    alert.count += 1
+    alert.actor  = actor
+    alert.save(update_fields=["count", "actor"])
+    if push and not outbox.is_pending("alerts.push", alert_id=alert.id):
+        outbox.enqueue("alerts.push", delay=COALESCE_PUSH_DELAY, alert_id=alert.id)
 
-def _create_and_push(**kwargs) -> None:
-    alert = Alert.objects.create(**kwargs)
-    transaction.on_commit(lambda: _push(alert))
+
+@outbox.handler("alerts.push")
+def push_alert(alert_id: int) -> None:
+    # قراءة مع قفل: تنتظر أي دمج (_coalesce_or_create) لم يُـcommit بعد
+    alert = Alert.objects.select_for_update().filter(pk=alert_id, is_read=False).first()
+    if alert is not None:
+        _push_many([alert], new=False)
+
+
+def _chunks(ids):
+    chunk = []
+    for user_id in ids:
+        chunk.append(user_id)
+        if len(chunk) >= FANOUT_CHUNK_SIZE:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _broadcast_and_push(push_ids, digest_ids, **fields) -> None:
+    """
+    صف BroadcastAlert واحد للمجتمع (يُدمج في قائمة كل عضو عند القراءة)،
+    ثم إرسال نفس الـpayload لمجموعات user_<id> بدفعات.
+    عدّادات الشارة تُحذف بطلب delete_many واحد لكل دفعة (تُبنى عند القراءة)،
+    وأعضاء الـdigest تُحذف عدّاداتهم فقط دون إرسال.
+    """
+    broadcast = BroadcastAlert.objects.create(**fields)
+    rendering.prepare([broadcast])
+    message = {"type": "alert", "payload": dict(BroadcastAlertSerializer(broadcast).data)}
+    for chunk in _chunks(push_ids):
+        feed.forget_unread_many(chunk)
+        outbox.send_many([(f"user_{uid}", message) for uid in chunk])
+    for chunk in _chunks(digest_ids):
+        feed.forget_unread_many(chunk)
 
 
 # ─────────────────────────── Reply signal ──────────────────────────
 @receiver(post_save, sender=Reply)
 def handle_reply_notifications(sender, instance: Reply, created, **kwargs):
-    if not created:
+    if created:
+        outbox.enqueue("alerts.reply_created", reply_id=instance.id)
+
+
+@outbox.handler("alerts.reply_created")
+def notify_reply(reply_id: int) -> None:
+    instance = (Reply.objects.select_related("thread__created_by", "thread__chat_room", "created_by")
+                .filter(pk=reply_id).first())
+    if instance is None:            # حُذف الرد قبل أن يصل إليه العامل
         return
 
     thread       = instance.thread
     replier      = instance.created_by
     thread_owner = thread.created_by
 
-    replier_name = _display_name(replier)
+    if not thread_owner or thread_owner == replier:
+        return
 
-    # 1. Notify the thread owner (unless he is the replier)
-    if thread_owner and thread_owner != replier:
-        _create_and_push(
-            recipient=thread_owner,
-            type=Alert.REPLY,
-            object_id=thread.id,
-            message=f"{replier_name} replied to your thread: {thread.title}",
-        )
+    room = thread.chat_room
+    mode = delivery_mode(thread_owner.id, Alert.REPLY, room.community_id, room.type, thread.id)
+    if mode == AlertPreference.OFF:
+        return
 
-    # 2. Extra notice for job-opportunity threads
-    if thread.is_job_opportunity and thread_owner and thread_owner != replier:
-        _create_and_push(
-            recipient=thread_owner,
-            type=Alert.REPLY,
-            object_id=thread.id,
-            message=f"{replier_name} commented on your job post: {thread.title}",
-        )
+    # منشورات الوظائف كانت تُنشئ تنبيهًا ثانيًا مكرّرًا؛ الآن قالب مختلف لنفس التنبيه
+    template = rendering.JOB_COMMENT if thread.is_job_opportunity else rendering.THREAD_REPLY
+    _coalesce_or_create(template, replier, mode == AlertPreference.IMMEDIATE,
+                        recipient=thread_owner, type=Alert.REPLY, object_id=thread.id)
 
 
 # ────────────────────────── Thread signal ──────────────────────────
@@ -79,35 +147,57 @@ def handle_reply_notifications(sender, instance: Reply, created, **kwargs):
 
 @receiver(post_save, sender=Thread)
 def handle_thread_notifications(sender, instance: Thread, created, **kwargs):
-    if not created:
-        return
+    if created:
+        outbox.enqueue("alerts.thread_created", thread_id=instance.id)
 
-    poster      = instance.created_by
-    poster_name = _display_name(poster) if poster else "Someone"
 
-    community   = instance.chat_room.community
+@outbox.handler("alerts.thread_created")
+def notify_thread(thread_id: int) -> None:
+    instance = (Thread.objects.select_related("chat_room", "created_by")
+                .filter(pk=thread_id).first())
+    if instance is None:
+        return
 
-    # ­----------------------------------------------
-    # **هنا كان سبب الخطأ**
-    # members = community.members.exclude(id=getattr(poster, "id", None))
-    # ­----------------------------------------------
-    member_qs = (
-        community.memberships        # <QuerySet في UserCommunity>
-        .exclude(user_id=getattr(poster, "id", None))
-        .select_related("user")      # لتجنب استعلام لكل مستخدم
+    poster = instance.created_by
+    fields = dict(
+        community_id=instance.chat_room.community_id,
+        room_type=instance.chat_room.type,
+        actor=poster,
+        type=Alert.JOB if instance.is_job_opportunity else Alert.INFO,
+        object_id=instance.id,
+        template=rendering.JOB_POSTED if instance.is_job_opportunity else rendering.THREAD_CREATED,
     )
-    recipients = [uc.user for uc in member_qs]
-    # ­----------------------------------------------
-
-    for user in recipients:
-        _create_and_push(
-            recipient=user,
-            type=Alert.JOB if instance.is_job_opportunity else Alert.INFO,
-            object_id=instance.id,
-            message=(
-                f"{poster_name} posted a new job opportunity: {instance.title}"
-                if instance.is_job_opportunity
-                else f"{poster_name} started a new thread: {instance.title}"
-            ),
-        )
 
+    # نمرّ على الأعضاء كـ ids بدفعات بدل تحميل كل المستخدمين في قائمة،
+    # فقط من يسمح له مستواه بفتح هذه الغرفة ولم يكتمها أو يوقف هذا النوع
+    room    = instance.chat_room
+    members = (UserCommunity.objects
+               .filter(audience_q(room.type), community_id=room.community_id)
+               .exclude(user_id=getattr(poster, "id", None)))
+    targeting  = (fields["type"], room.community_id, room.type)
+    push_ids   = (push_recipients(members, *targeting)
+                  .values_list("user_id", flat=True)
+                  .iterator(chunk_size=FANOUT_CHUNK_SIZE))
+    digest_ids = (digest_recipients(members, *targeting)
+                  .values_list("user_id", flat=True)
+                  .iterator(chunk_size=FANOUT_CHUNK_SIZE))
+
+    _broadcast_and_push(push_ids, digest_ids, **fields)
+
+
+# ─────────────────────── Membership watermark ──────────────────────
+@receiver(post_save, sender=UserCommunity)
+def create_alert_watermark(sender, instance: UserCommunity, created, **kwargs):
+    """العضو الجديد لا يرى بث المجتمع السابق لانضمامه."""
+    if not created:
+        return
+    top = BroadcastAlert.objects.aggregate(top=Max("id"))["top"] or 0
+    AlertWatermark.objects.get_or_create(
+        membership=instance, defaults={"start_id": top, "read_until_id": top},
+    )
+
+
+@receiver([post_save, post_delete], sender=UserCommunity, dispatch_uid="membership_unread_reset")
+def membership_changed(sender, instance: UserCommunity, **kwargs):
+    """الانضمام/المغادرة/change_level يغيّر البث المرئي → يُعاد بناء العدّاد."""
+    feed.forget_unread_many([instance.user_id])
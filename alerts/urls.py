@@ -1,8 +1,10 @@
 # alerts/urls.py
 from rest_framework.routers import DefaultRouter
-from .views import AlertViewSet
+from .views import AlertViewSet, AlertMuteViewSet, AlertPreferenceViewSet
 
 router = DefaultRouter()
 router.register(r"alerts", AlertViewSet, basename="alerts")
+router.register(r"alert-preferences", AlertPreferenceViewSet, basename="alert-preferences")
+router.register(r"alert-mutes", AlertMuteViewSet, basename="alert-mutes")
 
 urlpatterns = router.urls          # ← يُعيد  /alerts/   و  /alerts/<id>/mark_read/
@@ -1,4 +1,4 @@
-from django.shortcuts import render
+from django.shortcuts import render, get_object_or_404
 
 from rest_framework.generics import ListAPIView
 from rest_framework.permissions import IsAuthenticated
@@ -8,8 +8,10 @@ from rest_framework import mixins, viewsets, permissions, status   # ← أضف
 from rest_framework.decorators import action                      # ← أضف action
 from rest_framework.response import Response                      # ← أضف Response
 
-from .models import Alert
-from .serializers import AlertSerializer
+from .models import Alert, AlertMute, AlertPreference, BroadcastAlert
+from .serializers import (AlertSerializer, AlertMuteSerializer,
+                          AlertPreferenceSerializer, serialize_feed)
+from . import feed
 
 
 class UserAlertsView(ListAPIView):
@@ -24,22 +26,97 @@ class AlertViewSet(mixins.ListModelMixin,
     permission_classes = [permissions.IsAuthenticated]
     serializer_class   = AlertSerializer
 
+    def _unread_only(self):
+        return self.request.query_params.get("unread") == "true"
+
     def get_queryset(self):
-        qs = Alert.objects.filter(recipient=self.request.user)
-        if self.request.query_params.get("unread") == "true":
-            qs = qs.filter(is_read=False)
-        return qs
+        return feed.personal_alerts(self.request.user, self._unread_only())
+
+    def list(self, request, *args, **kwargs):
+        # التنبيهات الشخصية + بث المجتمعات (alerts.feed) في صفحة واحدة
+        keys = feed.feed_keys(request.user, self._unread_only())
+        page = self.paginate_queryset(keys)
+        alerts = feed.load_page(page if page is not None else list(keys))
+        data = serialize_feed(alerts, feed.read_watermarks(request.user))
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
 
     @action(methods=["patch"], detail=True)
     def mark_read(self, request, pk=None):
+        # ?scope=community → تنبيه بث؛ يُقدَّم مؤشر القراءة للمجتمع
+        if request.query_params.get("scope") == BroadcastAlert.scope:
+            broadcast = get_object_or_404(feed.broadcast_alerts(request.user), pk=pk)
+            feed.mark_broadcast_read(request.user, broadcast)
+            return Response(status=status.HTTP_204_NO_CONTENT)
+
         alert = self.get_object()
         alert.is_read = True
         alert.save(update_fields=["is_read"])
+        feed.forget_unread(request.user)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+    @action(methods=["get"], detail=False, url_path="unread-count")
+    def unread_count(self, request):
+        # عدّاد الشارة من الكاش بدل عدّ صفحات ?unread=true
+        return Response({"unread": feed.cached_unread_count(request.user)})
+
     @action(methods=["patch"], detail=False)
     def mark_all_read(self, request):
-        updated = (Alert.objects
-                        .filter(recipient=request.user, is_read=False)
-                        .update(is_read=True))
-        return Response({"updated": updated})
\ No newline at end of file
+        return Response({"updated": feed.mark_all_read(request.user)})
+
+
+class AlertPreferenceViewSet(mixins.ListModelMixin,
+                             viewsets.GenericViewSet):
+    """
+    GET   /api/alert-preferences/  → الوضع لكل نوع تنبيه (immediate إن لم يُحدَّد)
+    POST  /api/alert-preferences/  → {"type": "info", "mode": "digest"} (إنشاء أو تعديل)
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    serializer_class   = AlertPreferenceSerializer
+    pagination_class   = None
+
+    def get_queryset(self):
+        return AlertPreference.objects.filter(user=self.request.user)
+
+    def list(self, request, *args, **kwargs):
+        modes = dict(self.get_queryset().values_list("type", "mode"))
+        return Response([
+            {"type": t, "mode": modes.get(t, AlertPreference.IMMEDIATE)}
+            for t, _ in Alert.TYPES
+        ])
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        AlertPreference.objects.update_or_create(
+            user=request.user, type=serializer.validated_data["type"],
+            defaults={"mode": serializer.validated_data["mode"]},
+        )
+        feed.forget_unread(request.user)
+        return Response(serializer.data)
+
+
+class AlertMuteViewSet(mixins.ListModelMixin,
+                       mixins.CreateModelMixin,
+                       mixins.DestroyModelMixin,
+                       viewsets.GenericViewSet):
+    """
+    GET    /api/alert-mutes/       → الأهداف المكتومة
+    POST   /api/alert-mutes/       → {"thread": id} أو {"community": id, "room_type": "..."}
+    DELETE /api/alert-mutes/<id>/  → إلغاء الكتم
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    serializer_class   = AlertMuteSerializer
+    pagination_class   = None
+
+    def get_queryset(self):
+        return AlertMute.objects.filter(user=self.request.user)
+
+    def perform_create(self, serializer):
+        serializer.save(user=self.request.user)
+        feed.forget_unread(self.request.user)
+
+    def perform_destroy(self, instance):
+        instance.delete()
+        feed.forget_unread(self.request.user)
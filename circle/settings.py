@@ -122,6 +122,37 @@ CHANNEL_LAYERS = {
    # }
 #}
 
+# Shared cache (version stamps for ETag, ...) — يجب أن يكون مشتركًا بين كل العمليات
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": "redis://127.0.0.1:6379/1",
+    },
+}
+
+#CACHES = {
+ #   "default": {
+  #      "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+   # }
+#}
+
+# Alerts: عدد الأعضاء في كل دفعة إرسال WebSocket عند بث تنبيه لمجتمع كامل
+ALERTS_FANOUT_CHUNK_SIZE = 500
+# compact_alerts: حذف التنبيهات المقروءة الأقدم من هذا العدد من الأيام
+ALERTS_RETENTION_DAYS = 90
+# دمج تنبيهات الردود على نفس الثريد لنفس المستلم خلال هذه النافذة (ثوانٍ)،
+# مع تحديث واحد عبر WebSocket بعد ALERTS_COALESCE_PUSH_DELAY ثانية
+ALERTS_COALESCE_SECONDS    = 300
+ALERTS_COALESCE_PUSH_DELAY = 15
+# عدد التنبيهات غير المقروءة المُرسلة عند اتصال AlertConsumer
+ALERTS_BACKLOG_SIZE = 20
+
+# Realtime: نافذة دمج بثّ عدّاد اللايكات لكل ثريد/رد (ملّي ثانية)
+REALTIME_LIKE_WINDOW_MS = 250
+# مخزن إعادة تشغيل الأحداث لكل مجموعة (utils.replay): آخر N حدث لمدة TTL ثانية
+REALTIME_REPLAY_SIZE = 200
+REALTIME_REPLAY_TTL  = 600
+
 
 
 # Database
@@ -0,0 +1,113 @@
+# fields/membership.py
+"""
+محلّل العضويات: {community_id: {"level": ..., "rooms": [allowed room ids]}}
+
+• على مستوى الطلب: يُحفظ على كائن الطلب ويُشارَك بين IsCommunityMember
+  و get_queryset و perform_create والـSerializers.
+• عبر الطلبات: يُخزَّن في الكاش المشترك (CACHES) بمفتاح يحمل أختام
+  memberships:user_<id> و chat_rooms (utils.versions)، فيتقادم تلقائيًا عند
+  حفظ/حذف UserCommunity (change_level / leave / الانضمام) أو تغيّر الغرف.
+"""
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models import Q
+from django.http import Http404
+
+from ChatRoom.models import ChatRoom
+from fields.models import UserCommunity
+from utils.chat import allowed_types, levels_allowed
+from utils.versions import get_versions
+
+CACHE_TIMEOUT = 60 * 60
+
+LEVELS     = [level for level, _ in UserCommunity.LEVEL_CHOICES]
+USER_TYPES = [t for t, _ in get_user_model().USER_TYPE_CHOICES]
+
+
+def _cache_key(user) -> str:
+    member_v, rooms_v = get_versions(f"memberships:user_{user.pk}", "chat_rooms")
+    return f"memberships:user_{user.pk}:{user.user_type}:{member_v}:{rooms_v}"
+
+
+def load_memberships(user) -> dict[int, dict]:
+    """
+    خريطة عضويات المستخدم مع الغرف المسموح بها حسب المستوى ونوع الحساب.
+    تُقرأ من الكاش، وعند عدم وجودها تُبنى باستعلامين ثم تُخزَّن.
+    تُستدعى أيضًا من الـconsumers عبر database_sync_to_async.
+    """
+    if not user.is_authenticated:
+        return {}
+
+    key = _cache_key(user)
+    memberships = cache.get(key)
+    if memberships is not None:
+        return memberships
+
+    memberships = {
+        cid: {"level": level, "rooms": []}
+        for cid, level in (UserCommunity.objects
+                           .filter(user=user)
+                           .values_list("community_id", "level"))
+    }
+    rooms = (ChatRoom.objects
+             .filter(community_id__in=memberships)
+             .values_list("id", "community_id", "type"))
+    for room_id, cid, room_type in rooms:
+        entry = memberships[cid]
+        if room_type in allowed_types(entry["level"], user.user_type):
+            entry["rooms"].append(room_id)
+
+    cache.set(key, memberships, CACHE_TIMEOUT)
+    return memberships
+
+
+def request_memberships(request) -> dict[int, dict]:
+    """نفس load_memberships لكن محفوظة على كائن الطلب بعد أول استدعاء."""
+    memberships = getattr(request, "_memberships", None)
+    if memberships is None:
+        memberships = load_memberships(request.user)
+        request._memberships = memberships
+    return memberships
+
+
+def _entry(request, community_id) -> dict | None:
+    try:
+        community_id = int(community_id)
+    except (TypeError, ValueError):
+        return None
+    return request_memberships(request).get(community_id)
+
+
+def community_level(request, community_id) -> str | None:
+    """مستوى المستخدم في المجتمع، أو None إن لم يكن عضوًا."""
+    entry = _entry(request, community_id)
+    return entry["level"] if entry else None
+
+
+def get_level_or_404(request, community_id) -> str:
+    """مثل get_object_or_404(UserCommunity, ...) لكن من نفس الخريطة المحمّلة."""
+    level = community_level(request, community_id)
+    if level is None:
+        raise Http404("أنت لست عضوًا في هذا المجتمع.")
+    return level
+
+
+def allowed_room_ids_or_404(request, community_id) -> list[int]:
+    """الغرف التي يحق للمستخدم فتحها داخل المجتمع (بدل allowed_types + join)."""
+    entry = _entry(request, community_id)
+    if entry is None:
+        raise Http404("أنت لست عضوًا في هذا المجتمع.")
+    return entry["rooms"]
+
+
+def audience_q(room_type: str) -> Q:
+    """
+    شرط على UserCommunity: الأعضاء الذين يحق لهم فتح غرفة من نوع room_type
+    (نفس قواعد allowed_types لكن داخل استعلام قاعدة البيانات).
+    """
+    q = Q(pk__in=[])
+    for user_type in USER_TYPES:
+        levels = levels_allowed(room_type, user_type, LEVELS)
+        if levels:
+            q |= Q(user__user_type=user_type, level__in=levels)
+    return q
@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from .models import Field, Community, UserCommunity
+from .membership import community_level
 
 class FieldSerializer(serializers.ModelSerializer):
     class Meta:
@@ -25,11 +26,8 @@ class CommunitySerializer(serializers.ModelSerializer):
         return value
 
     def get_level(self, obj):
-        user = self.context['request'].user
-        if not user.is_authenticated:
-            return None
-        uc = obj.memberships.filter(user=user).first()
-        return uc.level if uc else None
+        # خريطة العضويات تُحمَّل مرة واحدة للطلب بدل استعلام لكل مجتمع
+        return community_level(self.context['request'], obj.id)
 
 class UserCommunitySerializer(serializers.ModelSerializer):
     community = CommunitySerializer(read_only=True)
@@ -1,7 +1,8 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from fields.models import Community
+from fields.models import Field, Community, UserCommunity
 from ChatRoom.models import ChatRoom
+from utils.versions import bump
 
 @receiver(post_save, sender=Community)
 def create_default_chat_rooms(sender, instance, created, **kwargs):
@@ -20,3 +21,16 @@ def create_default_chat_rooms(sender, instance, created, **kwargs):
                     'created_by': instance.created_by  # لو كانت متوفرة
                 }
             )
+
+
+# أختام النسخ لـ ETag الخاص بـ FieldViewSet / CommunityViewSet (utils.conditional)
+@receiver([post_save, post_delete], sender=Field)
+@receiver([post_save, post_delete], sender=Community)
+def catalog_changed(sender, instance, **kwargs):
+    bump("catalog")
+
+
+# يُقادم أيضًا خريطة العضويات المخزّنة (fields.membership): الانضمام، change_level، leave
+@receiver([post_save, post_delete], sender=UserCommunity)
+def membership_changed(sender, instance, **kwargs):
+    bump(f"memberships:user_{instance.user_id}")
@@ -9,10 +9,11 @@ from rest_framework.permissions import IsAuthenticated
 
 from .models import Field, Community, UserCommunity
 from .serializers import FieldSerializer, CommunitySerializer, UserCommunitySerializer
+from utils.conditional import ConditionalGetMixin
 
 User = get_user_model()
 
-class FieldViewSet(viewsets.ReadOnlyModelViewSet):
+class FieldViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
     """
     Read-only endpoints for Field.
     GET /api/fields/
@@ -24,15 +25,23 @@ class FieldViewSet(viewsets.ReadOnlyModelViewSet):
     permission_classes = [permissions.AllowAny]
     pagination_class = None  
 
+    def get_version_scopes(self):
+        if self.action == "get_communities":      # يحوي level الخاص بالمستخدم
+            return ["catalog", f"memberships:user_{self.request.user.pk}"]
+        return ["catalog"]
+
     @action(detail=True, methods=['get'], url_path='communities')
     def get_communities(self, request, pk=None):
+        return self.conditional(request, lambda: self._communities(request))
+
+    def _communities(self, request):
         field = self.get_object()
         communities = field.communities.all()
         serializer = CommunitySerializer(communities, many=True, context={'request': request})
         return Response(serializer.data)
 
 
-class CommunityViewSet(viewsets.ReadOnlyModelViewSet):
+class CommunityViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
     """
     Read-only endpoints for Community.
     GET /api/communities/
@@ -42,6 +51,9 @@ class CommunityViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = CommunitySerializer
     permission_classes = [permissions.AllowAny]
 
+    def get_version_scopes(self):
+        return ["catalog", f"memberships:user_{self.request.user.pk}"]
+
 
 class UserCommunityViewSet(viewsets.ModelViewSet):
     """
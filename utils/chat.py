@@ -11,3 +11,8 @@ def allowed_types(level: str, user_type: str) -> list[str]:
         base.extend(["discussion_general", "discussion_advanced"])
 
     return base
+
+
+def levels_allowed(room_type: str, user_type: str, levels) -> list[str]:
+    """عكس allowed_types: المستويات التي تفتح room_type لهذا النوع من الحسابات."""
+    return [level for level in levels if room_type in allowed_types(level, user_type)]
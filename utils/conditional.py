@@ -0,0 +1,52 @@
+# utils/conditional.py
+import hashlib
+
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from rest_framework.response import Response
+
+from utils.versions import get_versions
+
+
+class ConditionalGetMixin:
+    """
+    يرد بـ 304 على If-None-Match / If-Modified-Since قبل تنفيذ استعلام الـlist
+    أو تسلسل الـretrieve (الكائن نفسه يُجلب أولًا لفحص الصلاحيات).
+
+    الـViewSet يعرّف get_version_scopes() → أسماء الـscopes التي يعتمد عليها الرد
+    (انظر utils.versions)؛ ETag = المسار + المستخدم + نسخ هذه الـscopes.
+    If-None-Match له الأولوية؛ Last-Modified بدقّة الثانية، لكن أختام utils.versions
+    تتزايد ثانية على الأقل مع كل تغيير، فيبقى If-Modified-Since وحده صحيحًا.
+    """
+
+    def get_version_scopes(self) -> list[str]:
+        return []
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional(request, lambda: super(ConditionalGetMixin, self).list(request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        # get_object() أولًا: 404 وصلاحيات الكائن تُفحص قبل أي 304
+        instance = self.get_object()
+        return self.conditional(request, lambda: Response(self.get_serializer(instance).data))
+
+    def conditional(self, request, render):
+        scopes = self.get_version_scopes()
+        if not scopes:
+            return render()
+
+        versions      = get_versions(*scopes)
+        last_modified = max(versions)
+        raw  = f"{request.get_full_path()}|{request.user.pk}|{versions}"
+        etag = quote_etag(hashlib.md5(raw.encode()).hexdigest())
+
+        not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if not_modified is not None:
+            return not_modified
+
+        response = render()
+        if response.status_code == 200:
+            response["ETag"]          = etag
+            response["Last-Modified"] = http_date(last_modified)
+            patch_cache_control(response, private=True, no_cache=True)
+        return response
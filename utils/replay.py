@@ -0,0 +1,52 @@
+# utils/replay.py
+"""
+أرقام تسلسل + مخزن إعادة تشغيل (replay buffer) لكل مجموعة WebSocket.
+
+• stamp(): يُستدعى من عامل الـOutbox قبل الإرسال؛ يعطي الحدث seq متزايدًا
+  لمجموعته ويحفظه في الكاش المشترك (Redis) لمدة REPLAY_TTL.
+• missed(): عند إعادة الاتصال يرجع الأحداث بعد last_seq، أو None إذا كانت
+  الفجوة أكبر من REPLAY_SIZE (أو انتهت صلاحيتها، أو عاد العدّاد للصفر) → على
+  العميل إعادة الجلب.
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+REPLAY_SIZE = getattr(settings, "REALTIME_REPLAY_SIZE", 200)
+REPLAY_TTL  = getattr(settings, "REALTIME_REPLAY_TTL", 10 * 60)
+
+
+def _seq_key(group: str) -> str:
+    return f"seq:{group}"
+
+
+def _event_key(group: str, seq: int) -> str:
+    return f"replay:{group}:{seq}"
+
+
+def current_seq(group: str) -> int:
+    return cache.get(_seq_key(group), 0)
+
+
+def stamp(group: str, payload: dict) -> dict:
+    """يرجع payload مع seq ويحفظه في مخزن المجموعة."""
+    cache.add(_seq_key(group), 0, timeout=None)
+    seq = cache.incr(_seq_key(group))
+    payload = {**payload, "seq": seq}
+    cache.set(_event_key(group, seq), payload, REPLAY_TTL)
+    return payload
+
+
+def missed(group: str, last_seq: int) -> list[dict] | None:
+    """الأحداث بعد last_seq بالترتيب، أو None إن لم يعد المخزن يغطي الفجوة."""
+    head = current_seq(group)
+    if last_seq > head:                  # ضاع مفتاح seq (flush/eviction) فبدأ العدّ من جديد
+        return None
+    if last_seq == head:
+        return []
+    if head - last_seq > REPLAY_SIZE:
+        return None
+    keys  = [_event_key(group, seq) for seq in range(last_seq + 1, head + 1)]
+    found = cache.get_many(keys)
+    if len(found) != len(keys):          # انتهت صلاحية جزء من الفجوة
+        return None
+    return [found[k] for k in keys]
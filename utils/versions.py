@@ -0,0 +1,54 @@
+# utils/versions.py
+"""
+أختام نسخ (version stamps) لكل مورد داخل الكاش المشترك.
+تُرفَع من السيجنالات بعد الـcommit، وتُقرأ لبناء ETag / Last-Modified
+أو لمفاتيح كاش تتقادم تلقائيًا عند تغيّر البيانات.
+"""
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+# أختام ثوانٍ صحيحة متزايدة بصرامة (انظر bump)؛ البادئة تغيّرت عن "ver:" لأن
+# الأختام القديمة كانت float ولا يقبلها incr
+_PREFIX = "ver:s:"
+
+
+def get_versions(*scopes: str) -> list[int]:
+    """نسخة كل scope بنفس الترتيب؛ الـscope غير الموجود يبدأ من الآن."""
+    keys   = [_PREFIX + s for s in scopes]
+    found  = cache.get_many(keys)
+    now    = int(time.time())
+    missing = {k: now for k in keys if k not in found}
+    if missing:
+        cache.set_many(missing, timeout=None)
+        found.update(missing)
+    return [found[k] for k in keys]
+
+
+def _advance(key: str, now: int) -> None:
+    """
+    الختم الجديد = max(الآن, القديم + 1) بعمليات incr ذرّية: تغييران في نفس
+    الثانية يعطيان ختمين مختلفين، فلا يُرجِع If-Modified-Since وحده 304 لبيانات قديمة.
+    """
+    if cache.add(key, now, timeout=None):
+        return
+    try:
+        stamp = cache.incr(key)
+    except ValueError:               # حُذف المفتاح بين add و incr
+        cache.add(key, now, timeout=None)
+        return
+    if stamp < now:
+        cache.incr(key, now - stamp)
+
+
+def bump(*scopes: str) -> None:
+    """
+    يرفع نسخة الـscopes بعد نجاح الـcommit، حتى لا يُبنى ETag جديد
+    على بيانات لم تُكتب بعد.
+    """
+    def _write():
+        now = int(time.time())
+        for scope in scopes:
+            _advance(_PREFIX + scope, now)
+    transaction.on_commit(_write)